@@ -0,0 +1,173 @@
+"""Microbenchmarks of the Python side of tls_client.
+
+The shared library is replaced by a stub (stub/tls_client_stub.c), which answers every request with a canned response,
+so the numbers only contain the overhead of the wrapper. Each phase of `Session.execute_request` is measured on its
+own, plus complete requests through the stub.
+
+Usage:
+    python benchmarks/run.py                              # run and print the results
+    python benchmarks/run.py --save benchmarks/baseline.json
+    python benchmarks/run.py --compare benchmarks/baseline.json --threshold 0.5
+
+With --compare the exit code is 1 if a benchmark got slower than the baseline by more than the threshold.
+"""
+from typing import Callable, Dict
+import subprocess
+import argparse
+import platform
+import timeit
+import json
+import sys
+import os
+
+benchmarks_dir = os.path.abspath(os.path.dirname(__file__))
+stub_source = os.path.join(benchmarks_dir, "stub", "tls_client_stub.c")
+stub_library = os.path.join(benchmarks_dir, "stub", "build", "tls-client-stub.so")
+
+
+def build_stub() -> str:
+    """Compiles the stub library if it is missing or outdated"""
+    if not os.path.exists(stub_library) or os.path.getmtime(stub_library) < os.path.getmtime(stub_source):
+        os.makedirs(os.path.dirname(stub_library), exist_ok=True)
+        compiler = os.environ.get("CC", "cc")
+        subprocess.run([compiler, "-O2", "-shared", "-fPIC", "-o", stub_library, stub_source], check=True)
+    return stub_library
+
+
+def measure(function: Callable[[], object], min_time: float = 0.2, repeat: int = 5) -> Dict[str, float]:
+    """Returns the best and median time per call in nanoseconds"""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(int(number * min_time / 0.2), 1)
+    timings = sorted(timing / number * 1e9 for timing in timer.repeat(repeat=repeat, number=number))
+    return {"best_ns": round(timings[0], 1), "median_ns": round(timings[len(timings) // 2], 1), "number": number}
+
+
+def benchmarks() -> Dict[str, Callable[[], object]]:
+    os.environ["TLS_CLIENT_LIBRARY_PATH"] = build_stub()
+    sys.path.insert(0, os.path.dirname(benchmarks_dir))
+
+    import urllib.parse
+    import tls_client
+    from tls_client.cffi import call, request
+    from tls_client.cookies import extract_cookies_to_jar
+    from tls_client.json_codecs import get_codec
+    from tls_client.response import build_response
+    from tls_client.structures import merge_headers
+
+    codec = get_codec()
+    session = tls_client.Session(client_identifier="chrome_120")
+
+    # browser like headers
+    session.headers.update({f"X-Session-Header-{i}": f"value-{i}" for i in range(20)})
+    request_headers = {"Referer": "https://www.example.com/", "X-Request": "1", "Accept": "text/html", "Connection": None}
+
+    # cookies of many domains, a few of them match the url
+    for i in range(500):
+        session.cookies.set(f"cookie_{i}", f"value_{i}", domain=f".domain{i % 50}.com", path="/")
+    cookie_url = "https://www.domain7.com/path/"
+
+    params = {"q": "search term", "page": 2, "filter": ["a", "b", "c"]}
+    json_body = {"items": [{"id": i, "name": f"item {i}", "tags": ["a", "b"]} for i in range(50)]}
+    form_body = {f"field_{i}": f"value {i}" for i in range(20)}
+    dynamic_payload = {
+        "followRedirects": False,
+        "headers": merge_headers(session.headers, request_headers),
+        "insecureSkipVerify": False,
+        "isByteRequest": False,
+        "isByteResponse": False,
+        "proxyUrl": "",
+        "requestUrl": "https://www.example.com/?q=1",
+        "requestMethod": "GET",
+        "requestBody": None,
+        "timeoutSeconds": 30,
+    }
+    serialized_cookies = session._get_request_cookies(session.cookies, cookie_url, codec)
+
+    def payload():
+        return b"{" + session._get_static_payload(codec) + b',"requestCookies":' + serialized_cookies + b"," + codec.dumps(dynamic_payload)[1:]
+
+    envelopes = {
+        size: call(request, codec.dumps({"requestUrl": f"https://stub.local/?size={size}&headers=20&cookies=2"}))
+        for size in (1024, 102400)
+    }
+    envelope_small = codec.loads(envelopes[1024])
+    envelope_large = codec.loads(envelopes[102400])
+    response_headers_without_cookies = {key: value for key, value in envelope_small["headers"].items() if key != "Set-Cookie"}
+    cookie_jar = tls_client.cookies.RequestsCookieJar()
+
+    def cookie_serialization_uncached():
+        session._request_cookies_cache.clear()
+        return session._get_request_cookies(session.cookies, cookie_url, codec)
+
+    return {
+        # --- phases of execute_request ---------------------------------------------------------------------------
+        "url_params": lambda: f"https://www.example.com/?{urllib.parse.urlencode(params, doseq=True)}",
+        "body_json": lambda: json.dumps(json_body),
+        "body_form": lambda: urllib.parse.urlencode(form_body, doseq=True),
+        "header_merge": lambda: merge_headers(session.headers, request_headers, {"Content-Type": "application/json"}),
+        "cookie_serialization": cookie_serialization_uncached,
+        "cookie_serialization_cached": lambda: session._get_request_cookies(session.cookies, cookie_url, codec),
+        "payload_json": payload,
+        "envelope_parse_1kb": lambda: codec.loads(envelopes[1024]),
+        "envelope_parse_100kb": lambda: codec.loads(envelopes[102400]),
+        "extract_cookies_none": lambda: extract_cookies_to_jar(
+            "https://stub.local/", None, cookie_jar, response_headers_without_cookies
+        ),
+        "extract_cookies_2": lambda: extract_cookies_to_jar("https://stub.local/", None, cookie_jar, envelope_small["headers"]),
+        "build_response_status": lambda: build_response(envelope_small, None).status_code,
+        "build_response_text_100kb": lambda: build_response(envelope_large, None).text,
+        "build_response_json_header": lambda: build_response(envelope_small, None).headers["content-type"],
+        # --- complete requests through the stub ------------------------------------------------------------------
+        "execute_request_1kb": lambda: session.get("https://stub.local/?size=1024"),
+        "execute_request_100kb": lambda: session.get("https://stub.local/?size=102400"),
+        "execute_request_cookies": lambda: session.get(cookie_url + "?size=1024&cookies=2", headers=request_headers),
+        "execute_request_post_json": lambda: session.post("https://stub.local/?size=1024", json=json_body),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", help="write the results to this file")
+    parser.add_argument("--compare", help="compare the results with this baseline file")
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed slowdown compared to the baseline")
+    parser.add_argument("--filter", help="only run benchmarks containing this string")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per measurement")
+    args = parser.parse_args()
+
+    results = {}
+    for name, function in benchmarks().items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(function, min_time=args.min_time)
+        print(f"{name:<32} {results[name]['median_ns'] / 1000:>10.2f} us")
+
+    output = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(output, f, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            change = result["best_ns"] / baseline[name]["best_ns"] - 1
+            print(f"{name:<32} {change:>+8.1%}")
+            if change > args.threshold:
+                regressions.append(name)
+        if regressions:
+            print(f"regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+/*
+ * Stub of the tls-client shared library for the benchmarks.
+ *
+ * It exports the same functions as the Go library, but instead of sending a request it answers every call with a
+ * canned response, so the benchmarks only measure the Python side. The response can be configured with query
+ * parameters of the request url:
+ *
+ *   size=<n>        body of n bytes (default 1024)
+ *   headers=<n>     n additional response headers (default 10)
+ *   cookies=<n>     n Set-Cookie headers (default 0)
+ *
+ * The id of every response is the address of its allocation, freeMemory frees it.
+ *
+ * Build: cc -O2 -shared -fPIC -o tls-client-stub.so tls_client_stub.c
+ */
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+static long query_parameter(const char *payload, const char *name, long fallback)
+{
+    const char *url = strstr(payload, "\"requestUrl\"");
+    const char *query;
+    size_t name_length = strlen(name);
+
+    if (url == NULL || (query = strchr(url, '?')) == NULL) {
+        return fallback;
+    }
+    while ((query = strstr(query, name)) != NULL) {
+        char previous = query[-1];
+        if ((previous == '?' || previous == '&') && query[name_length] == '=') {
+            return strtol(query + name_length + 1, NULL, 10);
+        }
+        query += name_length;
+    }
+    return fallback;
+}
+
+static char *respond(long body_size, long header_count, long cookie_count, int status)
+{
+    size_t capacity = (size_t)body_size + (size_t)(header_count + cookie_count) * 96 + 512;
+    char *response = malloc(capacity);
+    char *position;
+    long i;
+
+    if (response == NULL) {
+        return NULL;
+    }
+    /* the id is written last, once the address is known, it always has the same width */
+    position = response + sprintf(response, "{\"id\":\"%016lx\",\"status\":%d,\"sessionId\":\"stub\",", 0UL, status);
+    position += sprintf(position, "\"target\":\"https://stub.local/\",\"usedProtocol\":\"HTTP/2.0\",\"cookies\":{},");
+    position += sprintf(position, "\"headers\":{\"Content-Type\":[\"text/plain; charset=utf-8\"]");
+    for (i = 0; i < header_count; i++) {
+        position += sprintf(position, ",\"X-Stub-Header-%ld\":[\"value-%ld\"]", i, i);
+    }
+    if (cookie_count > 0) {
+        position += sprintf(position, ",\"Set-Cookie\":[");
+        for (i = 0; i < cookie_count; i++) {
+            position += sprintf(position, "%s\"cookie_%ld=value_%ld; Path=/; Max-Age=3600\"", i ? "," : "", i, i);
+        }
+        position += sprintf(position, "]");
+    }
+    position += sprintf(position, "},\"body\":\"");
+    memset(position, 'x', (size_t)body_size);
+    position += body_size;
+    sprintf(position, "\"}");
+
+    char id[17];
+    sprintf(id, "%016lx", (unsigned long)response);
+    memcpy(response + 7, id, 16);
+    return response;
+}
+
+char *request(char *payload)
+{
+    return respond(
+        query_parameter(payload, "size", 1024),
+        query_parameter(payload, "headers", 10),
+        query_parameter(payload, "cookies", 0),
+        200
+    );
+}
+
+char *destroySession(char *payload)
+{
+    (void)payload;
+    return respond(0, 0, 0, 200);
+}
+
+char *destroyAll(void)
+{
+    return respond(0, 0, 0, 200);
+}
+
+void freeMemory(char *id)
+{
+    free((void *)strtoul(id, NULL, 16));
+}
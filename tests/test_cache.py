@@ -0,0 +1,121 @@
+from tls_client.cache import HTTPCache
+
+import time
+import pytest
+
+
+URL = "https://www.example.com/"
+
+
+def raw_response(status=200, headers=None, body="body"):
+    return {"target": URL, "status": status, "headers": headers or {}, "body": body, "usedProtocol": "HTTP/2.0"}
+
+
+def store(cache, raw, headers=None, method="GET", url=URL, cookies=b"[]"):
+    cache.store(method, url, headers or {}, cookies, False, raw, time.time())
+
+
+def lookup(cache, headers=None, url=URL, cookies=b"[]"):
+    return cache.lookup("GET", url, headers or {}, cookies, False)
+
+
+@pytest.fixture
+def cache():
+    return HTTPCache()
+
+
+def test_fresh_response_is_served(cache):
+    store(cache, raw_response(headers={"Cache-Control": ["max-age=60"]}))
+    entry, fresh = lookup(cache)
+    assert fresh
+    served = cache.serve(entry)
+    assert served["body"] == "body" and served["headers"]["Age"] == ["0"]
+    assert cache.stats()["hits"] == 1
+
+
+def test_stale_response_is_revalidated(cache):
+    store(cache, raw_response(headers={"Cache-Control": ["max-age=0"], "ETag": ['"v1"']}))
+    entry, fresh = lookup(cache)
+    assert entry is not None and not fresh
+    assert cache.conditional_headers(entry, {"Accept": "*/*"}) == {"Accept": "*/*", "If-None-Match": '"v1"'}
+    # validators set by the caller are kept
+    assert cache.conditional_headers(entry, {"if-none-match": '"v0"'}) == {"if-none-match": '"v0"'}
+
+    served = cache.revalidated(
+        entry, raw_response(304, {"Cache-Control": ["max-age=60"], "Content-Length": ["0"]}, ""), time.time()
+    )
+    assert served["status"] == 200 and served["body"] == "body"
+    assert served["headers"]["Cache-Control"] == ["max-age=60"]
+    assert "Content-Length" not in served["headers"]
+    assert lookup(cache)[1]
+
+
+def test_unvalidatable_stale_response_is_not_stored(cache):
+    store(cache, raw_response(headers={"Cache-Control": ["max-age=0"]}))
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("status", [100, 206, 304])
+def test_non_final_and_not_modified_responses_are_not_stored(cache, status):
+    store(cache, raw_response(status, {"Cache-Control": ["max-age=60"], "ETag": ['"v1"']}, ""),
+          headers={"If-None-Match": '"v1"'})
+    assert len(cache) == 0
+    assert lookup(cache) == (None, False)
+
+
+def test_status_without_explicit_freshness_is_not_stored(cache):
+    store(cache, raw_response(500, {"Last-Modified": ["Wed, 01 Jan 2020 00:00:00 GMT"]}))
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("response_headers, request_headers", [
+    ({"Cache-Control": ["no-store, max-age=60"]}, {}),
+    ({"Cache-Control": ["max-age=60"]}, {"Cache-Control": "no-store"}),
+    ({"Cache-Control": ["max-age=60"], "Vary": ["*"]}, {}),
+])
+def test_no_store(cache, response_headers, request_headers):
+    store(cache, raw_response(headers=response_headers), headers=request_headers)
+    assert len(cache) == 0
+
+
+def test_request_no_cache_and_max_age(cache):
+    store(cache, raw_response(headers={"Cache-Control": ["max-age=60"], "Age": ["30"]}))
+    assert lookup(cache)[1]
+    assert not lookup(cache, {"Cache-Control": "no-cache"})[1]
+    assert not lookup(cache, {"Cache-Control": "max-age=10"})[1]
+
+
+def test_vary(cache):
+    store(cache, raw_response(headers={"Cache-Control": ["max-age=60"], "Vary": ["Accept-Language, Cookie"]}),
+          headers={"Accept-Language": "en"}, cookies=b'[{"name":"a"}]')
+    assert lookup(cache, {"accept-language": "en"}, cookies=b'[{"name":"a"}]')[1]
+    assert lookup(cache, {"Accept-Language": "de"}, cookies=b'[{"name":"a"}]') == (None, False)
+    assert lookup(cache, {"Accept-Language": "en"}) == (None, False)
+
+
+def test_unsafe_request_invalidates(cache):
+    store(cache, raw_response(headers={"Cache-Control": ["max-age=60"]}))
+    store(cache, raw_response(500), method="POST")
+    assert len(cache) == 1
+    store(cache, raw_response(201), method="POST")
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    # an entry takes about 600 bytes
+    cache = HTTPCache(max_bytes=1200)
+    for index in range(5):
+        store(cache, raw_response(headers={"Cache-Control": ["max-age=60"]}, body="x" * 300), url=f"{URL}{index}")
+    assert len(cache) == 2
+    assert lookup(cache, url=f"{URL}4")[1]
+    assert lookup(cache, url=f"{URL}0") == (None, False)
+
+
+def test_disk(tmp_path):
+    store(HTTPCache(directory=str(tmp_path)), raw_response(headers={"Cache-Control": ["max-age=60"]}))
+    # another cache (e.g. of another process) finds the entry on disk
+    cache = HTTPCache(directory=str(tmp_path))
+    entry, fresh = lookup(cache)
+    assert fresh and cache.serve(entry)["body"] == "body"
+    cache.clear()
+    assert list(tmp_path.iterdir()) == []
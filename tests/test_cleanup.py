@@ -0,0 +1,38 @@
+from tls_client import cleanup, sessions
+from tls_client.sessions import Session
+
+import json
+import gc
+
+
+def counts():
+    return {key: value for key, value in cleanup.stats().items() if key in ("created", "closed", "alive")}
+
+
+def test_stats_count_each_session_once(monkeypatch):
+    def call(function, payload):
+        payload = json.loads(payload)
+        return json.dumps({
+            "id": "response",
+            "sessionId": payload["sessionId"],
+            "status": 200,
+            "target": payload["requestUrl"],
+            "body": "ok",
+            "headers": {},
+            "cookies": {},
+        }).encode()
+
+    monkeypatch.setattr(sessions, "call", call)
+    # sessions of other tests waiting for the garbage collector
+    gc.collect()
+    before = counts()
+    session = Session()
+    session.close()
+    session.close()
+    assert counts() == {**before, "created": before["created"] + 1, "closed": before["closed"] + 1}
+
+    # used again after close
+    session.get("https://www.example.com/")
+    assert counts() == {**before, "created": before["created"] + 1, "alive": before["alive"] + 1}
+    session.close()
+    assert counts() == {**before, "created": before["created"] + 1, "closed": before["closed"] + 1}
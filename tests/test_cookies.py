@@ -0,0 +1,161 @@
+"""Conformance of `extract_cookies_to_jar` with the HTTPMessage based extraction it replaced."""
+from tls_client.cookies import cookiejar_from_dict, extract_cookies_to_jar, merge_cookies
+from tls_client.structures import CaseInsensitiveDict
+
+from http.client import HTTPMessage
+from urllib.parse import urlparse, urlunparse
+import pytest
+
+
+# --- Previous implementation ------------------------------------------------------------------------------------------
+
+class LegacyMockRequest:
+    def __init__(self, request_url, request_headers):
+        self.request_url = request_url
+        self.request_headers = request_headers
+        self._new_headers = {}
+        self.type = urlparse(self.request_url).scheme
+
+    def get_type(self):
+        return self.type
+
+    def get_host(self):
+        return urlparse(self.request_url).netloc
+
+    def get_origin_req_host(self):
+        return self.get_host()
+
+    def get_full_url(self):
+        if not self.request_headers.get("Host"):
+            return self.request_url
+        parsed = urlparse(self.request_url)
+        return urlunparse(
+            [parsed.scheme, self.request_headers["Host"], parsed.path, parsed.params, parsed.query, parsed.fragment]
+        )
+
+    def is_unverifiable(self):
+        return True
+
+    def has_header(self, name):
+        return name in self.request_headers or name in self._new_headers
+
+    def get_header(self, name, default=None):
+        return self.request_headers.get(name, self._new_headers.get(name, default))
+
+    def add_unredirected_header(self, name, value):
+        self._new_headers[name] = value
+
+    def get_new_headers(self):
+        return self._new_headers
+
+    @property
+    def unverifiable(self):
+        return self.is_unverifiable()
+
+    @property
+    def origin_req_host(self):
+        return self.get_origin_req_host()
+
+    @property
+    def host(self):
+        return self.get_host()
+
+
+class LegacyMockResponse:
+    def __init__(self, headers):
+        self._headers = headers
+
+    def info(self):
+        return self._headers
+
+
+def legacy_extract_cookies_to_jar(request_url, request_headers, cookie_jar, response_headers):
+    response_cookie_jar = cookiejar_from_dict({})
+    http_message = HTTPMessage()
+    http_message._headers = []
+    for header_name, header_values in response_headers.items():
+        for header_value in header_values:
+            http_message._headers.append((header_name, header_value))
+    response_cookie_jar.extract_cookies(
+        LegacyMockResponse(http_message), LegacyMockRequest(request_url, request_headers)
+    )
+    merge_cookies(cookie_jar, response_cookie_jar)
+    return response_cookie_jar
+
+
+# --- Cases ------------------------------------------------------------------------------------------------------------
+
+def cookie_key(cookie):
+    return (
+        cookie.name,
+        cookie.value,
+        cookie.domain,
+        cookie.domain_specified,
+        cookie.domain_initial_dot,
+        cookie.path,
+        cookie.path_specified,
+        cookie.secure,
+        cookie.port,
+        cookie.discard,
+        # max-age is relative to the current time
+        None if cookie.expires is None else cookie.expires // 10,
+    )
+
+
+def jar_keys(jar):
+    return sorted((cookie_key(cookie) for cookie in jar), key=repr)
+
+
+CASES = {
+    "plain": ("https://www.example.com/", {}, {"Set-Cookie": ["a=1"]}),
+    "several": ("https://www.example.com/", {}, {"Set-Cookie": ["a=1", "b=2; Path=/", "c=3; HttpOnly"]}),
+    "domain": ("https://www.example.com/", {}, {"Set-Cookie": ["a=1; Domain=example.com"]}),
+    "domain dot": ("https://www.example.com/", {}, {"Set-Cookie": ["a=1; Domain=.example.com"]}),
+    "foreign domain": ("https://www.example.com/", {}, {"Set-Cookie": ["a=1; Domain=example.org", "b=2"]}),
+    "public suffix": ("https://www.example.co.uk/", {}, {"Set-Cookie": ["a=1; Domain=.co.uk"]}),
+    "path": ("https://www.example.com/a/b", {}, {"Set-Cookie": ["a=1", "b=2; Path=/a", "c=3; Path=/x"]}),
+    "secure": ("https://www.example.com/", {}, {"Set-Cookie": ["a=1; Secure", "b=2"]}),
+    "secure over http": ("http://www.example.com/", {}, {"Set-Cookie": ["a=1; Secure"]}),
+    "max-age": ("https://www.example.com/", {}, {"Set-Cookie": ["a=1; Max-Age=3600", "b=2; Max-Age=0"]}),
+    "expires": (
+        "https://www.example.com/",
+        {},
+        {"Set-Cookie": ["a=1; Expires=Wed, 01 Jan 2200 00:00:00 GMT", "b=2; Expires=Thu, 01 Jan 1970 00:00:00 GMT"]},
+    ),
+    "quoted": ("https://www.example.com/", {}, {"Set-Cookie": ['a="x y"; Path=/']}),
+    "host override": (
+        "https://10.0.0.1/login",
+        CaseInsensitiveDict({"Host": "www.example.com"}),
+        {"Set-Cookie": ["a=1; Domain=example.com", "b=2"]},
+    ),
+    "localhost": ("http://localhost:8080/", {}, {"Set-Cookie": ["a=1", "b=2; Domain=localhost"]}),
+    "ip": ("http://127.0.0.1:8080/x/", {}, {"Set-Cookie": ["a=1", "b=2; Domain=127.0.0.1", "c=3; Path=/"]}),
+    "lowercase header": ("https://www.example.com/", {}, {"set-cookie": ["a=1"]}),
+    "set-cookie2": ("https://www.example.com/", {}, {"Set-Cookie2": ['a="1"; Version="1"']}),
+    "other headers": (
+        "https://www.example.com/",
+        {},
+        {"Content-Type": ["text/html"], "Set-Cookie": ["a=1"], "Cache-Control": ["no-store"]},
+    ),
+    "no set-cookie": ("https://www.example.com/", {}, {"Content-Type": ["text/html"]}),
+    "no headers": ("https://www.example.com/", {}, {}),
+}
+
+
+@pytest.mark.parametrize("request_url, request_headers, response_headers", CASES.values(), ids=list(CASES))
+def test_extract_cookies_matches_legacy(request_url, request_headers, response_headers):
+    legacy_jar = cookiejar_from_dict({"existing": "1"})
+    jar = cookiejar_from_dict({"existing": "1"})
+
+    legacy_response_jar = legacy_extract_cookies_to_jar(request_url, request_headers, legacy_jar, response_headers)
+    response_jar = extract_cookies_to_jar(request_url, request_headers, jar, response_headers)
+
+    assert jar_keys(jar) == jar_keys(legacy_jar)
+    # responses without cookies return None instead of an empty jar
+    assert jar_keys(response_jar or []) == jar_keys(legacy_response_jar)
+
+
+def test_extract_cookies_without_set_cookie_returns_none():
+    jar = cookiejar_from_dict({})
+    assert extract_cookies_to_jar("https://www.example.com/", {}, jar, {"Content-Type": ["text/html"]}) is None
+    assert len(jar) == 0
@@ -0,0 +1,106 @@
+from tls_client import sessions
+from tls_client.async_sessions import AsyncSession
+from tls_client.exceptions import TLSClientExeption
+from tls_client.proxies import ProxyManager
+from tls_client.session_pool import SessionPool
+from tls_client.sessions import Session
+
+import asyncio
+import json
+import pytest
+
+
+PROXIES = ["http://proxy1:8080", "http://proxy2:8080", "http://proxy3:8080"]
+
+
+@pytest.fixture
+def native(monkeypatch):
+    """Replaces the shared library call, ``native.errors`` maps a proxy to the error message it fails with"""
+    class Native:
+        errors = {}
+        sent = []
+
+    def call(function, payload):
+        payload = json.loads(payload)
+        Native.sent.append(payload["proxyUrl"])
+        error = Native.errors.get(payload["proxyUrl"])
+        return json.dumps({
+            "id": "response",
+            "sessionId": payload["sessionId"],
+            "status": 0 if error else 200,
+            "target": payload["requestUrl"],
+            "body": error or "ok",
+            "headers": {},
+            "cookies": {},
+        }).encode()
+
+    monkeypatch.setattr(sessions, "call", call)
+    return Native
+
+
+def test_async_session_with_proxy_manager(native):
+    async def main():
+        async with AsyncSession(max_workers=4) as session:
+            session.proxies = ProxyManager(PROXIES)
+            return await asyncio.gather(*(session.get("https://www.example.com/") for _ in range(6)))
+
+    responses = asyncio.run(main())
+    assert [response.status_code for response in responses] == [200] * 6
+    assert sorted(native.sent) == sorted(PROXIES * 2)
+
+
+def test_failover_after_proxy_connect_error(native):
+    native.errors[PROXIES[0]] = "proxyconnect tcp: dial tcp 10.0.0.1:8080: connect: connection refused"
+    session = Session()
+    response = session.post("https://www.example.com/", data="x", proxy=ProxyManager(PROXIES))
+    assert response.status_code == 200
+    assert native.sent == PROXIES[:2]
+
+
+@pytest.mark.parametrize("error", [
+    "read tcp 10.0.0.2:51234->10.0.0.1:8080: read: connection reset by peer",
+    "net/http: timeout awaiting response headers",
+    "unexpected EOF",
+])
+def test_no_failover_for_post_after_error_past_connect(native, error):
+    native.errors[PROXIES[0]] = error
+    session = Session()
+    with pytest.raises(TLSClientExeption):
+        session.post("https://www.example.com/", data="x", proxy=ProxyManager(PROXIES))
+    assert native.sent == PROXIES[:1]
+
+    # idempotent methods are sent again
+    native.sent.clear()
+    assert session.get("https://www.example.com/", proxy=ProxyManager(PROXIES)).status_code == 200
+    assert native.sent == PROXIES[:2]
+
+
+def test_errors_of_the_target_do_not_open_the_circuit(native):
+    for proxy in PROXIES:
+        native.errors[proxy] = "x509: certificate signed by unknown authority"
+    proxies = ProxyManager(PROXIES, failure_threshold=1)
+    session = Session()
+    for _ in range(3):
+        with pytest.raises(TLSClientExeption):
+            session.get("https://pinned.example.com/", proxy=proxies)
+    assert [health["state"] for health in proxies.stats()] == ["closed"] * 3
+
+    native.errors.clear()
+    assert session.get("https://www.example.com/", proxy=proxies).status_code == 200
+
+
+def test_proxy_connect_errors_open_the_circuit(native):
+    native.errors[PROXIES[0]] = "proxyconnect tcp: dial tcp 10.0.0.1:8080: connect: connection refused"
+    proxies = ProxyManager(PROXIES, failure_threshold=1)
+    Session().get("https://www.example.com/", proxy=proxies)
+    assert [health["state"] for health in proxies.stats()] == ["open", "closed", "closed"]
+
+
+def test_session_pool_with_proxy_manager(native):
+    native.errors[PROXIES[0]] = "proxyconnect tcp: dial tcp 10.0.0.1:8080: connect: connection refused"
+    proxies = ProxyManager(PROXIES)
+    with SessionPool(max_sessions=1) as pool:
+        for _ in range(2):
+            assert pool.get("https://www.example.com/", proxy=proxies).status_code == 200
+        assert len(pool) == 1
+    assert native.sent == [PROXIES[0], PROXIES[1], PROXIES[2]]
@@ -0,0 +1,34 @@
+from tls_client import json_codecs
+from tls_client.json_codecs import get_codec
+from tls_client.response import Response
+
+import json
+import pytest
+
+
+BIG_INTEGER = "123456789012345678901234567890"
+
+
+def response(body, codec=None):
+    return Response({"target": "https://www.example.com/", "status": 200, "headers": {}, "body": body}, codec=codec)
+
+
+def test_json_without_codec_uses_the_json_module():
+    assert response(BIG_INTEGER).json() == int(BIG_INTEGER)
+    with pytest.raises(json.JSONDecodeError):
+        response("{invalid").json()
+
+
+def test_json_with_codec_raises_json_decode_error():
+    codec = get_codec("orjson" if json_codecs.orjson is not None else "json")
+    with pytest.raises(json.JSONDecodeError):
+        response("{invalid", codec).json()
+
+
+@pytest.mark.parametrize("delimiter", [b";", b"ab"])
+def test_iter_lines_with_delimiter_across_chunk_boundaries(delimiter):
+    for body in (b"b;aab;bba", b";a;;b;", b"abab;ab;a;b", b"x"):
+        raw = {"target": "https://www.example.com/", "status": 200, "headers": {}, "body": body.decode()}
+        for chunk_size in range(1, len(body) + 2):
+            lines = list(Response(raw).iter_lines(chunk_size=chunk_size, delimiter=delimiter))
+            assert lines == body.split(delimiter), (body, chunk_size)
@@ -12,4 +12,33 @@
 # tls-client: https://github.com/bogdanfinn/tls-client
 # requests: https://github.com/psf/requests
 
-from .sessions import Session
\ No newline at end of file
+from .sessions import Session
+
+import importlib
+
+# Imported on first access, so `import tls_client` does not load asyncio, http.server, multiprocessing, ... for
+# programs which only use `Session`
+_lazy_exports = {
+    "AsyncSession": ".async_sessions",
+    "SessionPool": ".session_pool",
+    "MetricsCollector": ".metrics",
+    "HTTPCache": ".cache",
+    "ProxyManager": ".proxies",
+    "RateLimiter": ".ratelimit",
+    "ProcessPool": ".process_pool",
+}
+
+__all__ = ["Session", *_lazy_exports]
+
+
+def __getattr__(name: str):
+    module = _lazy_exports.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_exports))
@@ -0,0 +1,223 @@
+from .ratelimit import _already_waited
+from .response import Response
+from .sessions import Session, _unpack_request_spec, _remaining, _deadline_exceeded, _InOrder
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, Tuple, Union
+import functools
+import threading
+import asyncio
+import time
+
+
+class AsyncSession(Session):
+    """Session with an awaitable API.
+
+    Every request (payload building, the blocking call into the shared library and response parsing) runs on a
+    bounded thread pool owned by this session, so the event loop thread never blocks on a round trip. The shared
+    library call releases the GIL, which lets ``max_workers`` requests be in flight at the same time.
+
+    Usage::
+
+        async with tls_client.AsyncSession(client_identifier="chrome_120", max_workers=256) as session:
+            res = await session.get("https://www.example.com/")
+    """
+
+    def __init__(self, *args: Any, max_workers: Optional[int] = 32, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+
+        # Maximum number of requests which are executed at the same time
+        self.max_workers = max_workers
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def __enter__(self):
+        raise TypeError("AsyncSession must be used with 'async with'")
+
+    def __exit__(self, *args):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="tls-client"
+                    )
+        return self._executor
+
+    async def _run_in_executor(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(func, *args, **kwargs))
+
+    async def close(self) -> str:
+        """Destroys the session in the shared library and shuts down the thread pool"""
+        try:
+            return await self._run_in_executor(Session.close, self)
+        finally:
+            executor, self._executor = self._executor, None
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    async def execute_request(
+        self,
+        method: str,
+        url: str,
+        **kwargs: Any
+    ) -> Response:
+        """Sends a request, accepts the same arguments as ``Session.execute_request``"""
+        stream, stream_to = kwargs.get("stream"), kwargs.get("stream_to")
+        if (
+            self.rate_limiter is not None
+            and not self._coalesces(method, stream, stream_to)
+            and not self._may_be_cached(method, stream, stream_to)
+        ):
+            # wait for the rate limiter on the event loop instead of blocking a worker thread. Requests which can be
+            # served from the cache or coalesced wait on the worker thread, only if they call the shared library.
+            await self.rate_limiter.wait_async(url)
+            return await self._run_in_executor(self._execute_rate_limited_request, method, url, **kwargs)
+        return await self._run_in_executor(Session.execute_request, self, method, url, **kwargs)
+
+    def _execute_rate_limited_request(self, method: str, url: str, **kwargs: Any) -> Response:
+        with _already_waited():
+            return Session.execute_request(self, method, url, **kwargs)
+
+    def as_completed(
+        self,
+        requests: Iterable[Union[tuple, dict]],
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[Tuple[int, Union[Response, Exception]]]:
+        """Awaitable version of ``Session.as_completed``, ``max_workers`` defaults to the session's thread pool size"""
+        return self._as_completed(requests, max_workers or self.max_workers or 10, timeout)
+
+    async def _as_completed(
+        self,
+        requests: Iterable[Union[tuple, dict]],
+        max_workers: int,
+        timeout: Optional[float],
+        in_order: Optional[_InOrder] = None
+    ) -> AsyncIterator[Tuple[int, Union[Response, Exception]]]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        specs = enumerate(requests)
+        pending = {}
+        try:
+            while True:
+                # --- Refill ---------------------------------------------------------------------------------------
+                # `map` stops sending requests while too many results wait for a slow one
+                while len(pending) < max_workers and (in_order is None or not in_order.full):
+                    try:
+                        index, spec = next(specs)
+                    except StopIteration:
+                        break
+                    try:
+                        method, url, kwargs = _unpack_request_spec(spec)
+                    except Exception as e:
+                        yield index, e
+                        continue
+                    task = asyncio.ensure_future(self.execute_request(method, url, **kwargs))
+                    pending[task] = index
+                if not pending:
+                    return
+
+                # --- Wait -----------------------------------------------------------------------------------------
+                done, _ = await asyncio.wait(
+                    pending, timeout=_remaining(deadline), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    for task in pending:
+                        task.cancel()
+                    for index, exception in _deadline_exceeded(pending.values(), specs):
+                        yield index, exception
+                    pending.clear()
+                    return
+                for task in done:
+                    index = pending.pop(task)
+                    exception = task.exception()
+                    yield index, exception if exception is not None else task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def map(
+        self,
+        requests: Iterable[Union[tuple, dict]],
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[Union[Response, Exception]]:
+        """Like ``as_completed``, but yields the results in the order of ``requests``, see ``Session.map``"""
+        max_workers = max_workers or self.max_workers or 10
+        in_order = _InOrder(limit=2 * max_workers)
+        async for index, result in self._as_completed(requests, max_workers, timeout, in_order):
+            for ready in in_order.add(index, result):
+                yield ready
+
+    async def get(
+        self,
+        url: str,
+        **kwargs: Any
+    ) -> Response:
+        """Sends a GET request"""
+        return await self.execute_request(method="GET", url=url, **kwargs)
+
+    async def options(
+        self,
+        url: str,
+        **kwargs: Any
+    ) -> Response:
+        """Sends a OPTIONS request"""
+        return await self.execute_request(method="OPTIONS", url=url, **kwargs)
+
+    async def head(
+        self,
+        url: str,
+        **kwargs: Any
+    ) -> Response:
+        """Sends a HEAD request"""
+        return await self.execute_request(method="HEAD", url=url, **kwargs)
+
+    async def post(
+        self,
+        url: str,
+        data: Optional[Union[str, dict]] = None,
+        json: Optional[dict] = None,
+        **kwargs: Any
+    ) -> Response:
+        """Sends a POST request"""
+        return await self.execute_request(method="POST", url=url, data=data, json=json, **kwargs)
+
+    async def put(
+        self,
+        url: str,
+        data: Optional[Union[str, dict]] = None,
+        json: Optional[dict] = None,
+        **kwargs: Any
+    ) -> Response:
+        """Sends a PUT request"""
+        return await self.execute_request(method="PUT", url=url, data=data, json=json, **kwargs)
+
+    async def patch(
+        self,
+        url: str,
+        data: Optional[Union[str, dict]] = None,
+        json: Optional[dict] = None,
+        **kwargs: Any
+    ) -> Response:
+        """Sends a PATCH request"""
+        return await self.execute_request(method="PATCH", url=url, data=data, json=json, **kwargs)
+
+    async def delete(
+        self,
+        url: str,
+        **kwargs: Any
+    ) -> Response:
+        """Sends a DELETE request"""
+        return await self.execute_request(method="DELETE", url=url, **kwargs)
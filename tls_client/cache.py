@@ -0,0 +1,421 @@
+from .json_codecs import JSONCodec, get_codec
+
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import threading
+import hashlib
+import time
+import os
+
+
+# Status codes which are cacheable by default, responses with other status codes need explicit freshness
+# (RFC 9110, section 15.1)
+HEURISTICALLY_CACHEABLE = frozenset((200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501))
+
+# Methods which invalidate the stored response of their url (RFC 9111, section 4.4)
+UNSAFE_METHODS = frozenset(("POST", "PUT", "DELETE", "PATCH"))
+
+# Headers of a 304 response which must not replace the stored ones (RFC 9111, section 3.2)
+_NOT_UPDATED_HEADERS = frozenset(("content-length", "content-encoding", "transfer-encoding", "content-range"))
+
+
+def _header(headers: Dict[str, List[str]], name: str) -> Optional[str]:
+    """Returns the comma joined values of a response header (``{name: [values]}``), matched case-insensitively"""
+    for key, values in headers.items():
+        if key.lower() == name:
+            return ", ".join(values) if isinstance(values, list) else values
+    return None
+
+
+def _parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    directives = {}
+    if value:
+        for directive in value.split(","):
+            name, _, argument = directive.strip().partition("=")
+            if name:
+                directives[name.lower()] = argument.strip('" ') if argument else None
+    return directives
+
+
+def _parse_seconds(value: Optional[str]) -> Optional[int]:
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class CacheEntry:
+    """A stored response and what is needed to decide whether it can be reused"""
+
+    __slots__ = (
+        "key",
+        "raw",
+        "vary",
+        "request_time",
+        "response_time",
+        "date",
+        "age",
+        "freshness_lifetime",
+        "no_cache",
+        "size",
+    )
+
+    def __init__(self, key: Tuple[str, str, bool], raw: dict, vary: Dict[str, Optional[str]], request_time: float,
+                 response_time: float) -> None:
+        self.key = key
+        # response of the shared library: target, status, headers, body and usedProtocol
+        self.raw = raw
+        # values of the request headers named by Vary, "cookie" holds the serialized request cookies
+        self.vary = vary
+        self.request_time = request_time
+        self.response_time = response_time
+        self.update()
+        self.size = len(raw["body"] or "") + sum(
+            len(name) + sum(len(value) for value in values) for name, values in raw["headers"].items()
+        ) + 256
+
+    def update(self) -> None:
+        """Computes the freshness from the stored headers (RFC 9111, section 4.2)"""
+        headers = self.raw["headers"]
+        cache_control = _parse_cache_control(_header(headers, "cache-control"))
+        self.date = _parse_date(_header(headers, "date"))
+        self.age = _parse_seconds(_header(headers, "age")) or 0
+        self.no_cache = "no-cache" in cache_control or _header(headers, "pragma") == "no-cache"
+
+        max_age = _parse_seconds(cache_control.get("max-age"))
+        expires = _header(headers, "expires")
+        if max_age is not None:
+            self.freshness_lifetime = max_age
+        elif expires is not None:
+            # an invalid Expires (e.g. "0") means already expired
+            expires = _parse_date(expires)
+            self.freshness_lifetime = max(expires - (self.date or self.response_time), 0) if expires else 0
+        else:
+            # heuristic freshness, 10% of the time since the last modification, at most a day
+            last_modified = _parse_date(_header(headers, "last-modified"))
+            if last_modified is not None and self.raw["status"] in HEURISTICALLY_CACHEABLE:
+                self.freshness_lifetime = min(max((self.date or self.response_time) - last_modified, 0) / 10, 86400)
+            else:
+                self.freshness_lifetime = 0
+
+    def current_age(self, now: float) -> float:
+        apparent_age = max(self.response_time - self.date, 0) if self.date is not None else 0
+        corrected_age_value = self.age + (self.response_time - self.request_time)
+        return max(apparent_age, corrected_age_value) + (now - self.response_time)
+
+    def validators(self) -> Dict[str, str]:
+        """Returns the headers of a conditional request revalidating the entry"""
+        headers = {}
+        etag = _header(self.raw["headers"], "etag")
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        last_modified = _header(self.raw["headers"], "last-modified")
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def to_dict(self) -> dict:
+        return {
+            "key": list(self.key),
+            "raw": self.raw,
+            "vary": self.vary,
+            "request_time": self.request_time,
+            "response_time": self.response_time,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CacheEntry":
+        return cls(tuple(data["key"]), data["raw"], data["vary"], data["request_time"], data["response_time"])
+
+
+class HTTPCache:
+    """Private HTTP cache (RFC 9111) for GET requests of one or more sessions.
+
+    Fresh responses are served without calling the shared library. Stale responses with an ETag or Last-Modified are
+    revalidated with a conditional request, a 304 updates the stored response, which is served again. ``Cache-Control``
+    (``no-store``, ``no-cache``, ``max-age``, ``must-revalidate``) of requests and responses, ``Expires``, ``Vary`` and
+    ``Pragma: no-cache`` are honored. Successful POST, PUT, PATCH and DELETE requests invalidate the stored response
+    of their url. Responses served from the cache have ``Response.from_cache`` set.
+
+    Entries are kept in an in-memory LRU bounded by ``max_bytes`` (approximate size of body and headers). With
+    ``directory`` they are also written to disk (bounded by ``max_disk_bytes``) and loaded from there after they were
+    evicted from memory or by another process.
+
+    Cookies are not part of the cache key, unless the response varies by ``Cookie``. Only share a cache between
+    sessions of different identities if the cached urls do not return personalized content.
+
+    Usage::
+
+        cache = tls_client.HTTPCache(max_bytes=64 * 1024 * 1024, directory="/var/cache/tls-client")
+        session = tls_client.Session(client_identifier="chrome_120", cache=cache)
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        directory: Optional[str] = None,
+        max_disk_bytes: int = 1024 * 1024 * 1024,
+        codec: Optional[JSONCodec] = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._codec = codec or get_codec()
+        self._entries: "OrderedDict[tuple, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0, "misses": 0, "stale": 0, "revalidated": 0, "stored": 0, "evicted": 0, "invalidated": 0
+        }
+        self._disk_bytes = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_bytes = sum(
+                entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".json")
+            )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the counters of the cache: hits, misses, stale, revalidated, stored, evicted and invalidated"""
+        with self._lock:
+            counts = dict(self._stats)
+            counts["entries"] = len(self._entries)
+            counts["bytes"] = self._bytes
+        return counts
+
+    def clear(self) -> None:
+        """Removes all entries from memory and disk"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.directory is not None:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".json"):
+                    self._remove_file(entry.path)
+
+    # --- Storage ------------------------------------------------------------------------------------------------------
+
+    def _path(self, key: tuple) -> str:
+        name = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _remove_file(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes -= size
+
+    def _get(self, key: tuple) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                entry = CacheEntry.from_dict(self._codec.loads(f.read()))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if entry.key != key:
+            return None
+        self._put_in_memory(entry)
+        return entry
+
+    def _put_in_memory(self, entry: CacheEntry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(entry.key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[entry.key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._stats["evicted"] += 1
+
+    def _put(self, entry: CacheEntry) -> None:
+        self._put_in_memory(entry)
+        if self.directory is None:
+            return
+        path = self._path(entry.key)
+        data = self._codec.dumps(entry.to_dict())
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(temporary_path, "wb") as f:
+                f.write(data)
+            os.replace(temporary_path, path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes += len(data) - previous_size
+            over_limit = self._disk_bytes > self.max_disk_bytes
+        if over_limit:
+            self._trim_disk()
+
+    def _trim_disk(self) -> None:
+        # removes the least recently written files until 90% of the limit is reached
+        files = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in files:
+            if self._disk_bytes <= self.max_disk_bytes * 0.9:
+                break
+            self._remove_file(entry.path)
+
+    def invalidate(self, url: str) -> None:
+        """Removes the stored responses of an url"""
+        for is_byte_response in (False, True):
+            key = ("GET", url, is_byte_response)
+            with self._lock:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= entry.size
+            if self.directory is not None:
+                self._remove_file(self._path(key))
+        self._count("invalidated")
+
+    # --- Session interface --------------------------------------------------------------------------------------------
+
+    def lookup(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        request_cookies: bytes,
+        is_byte_response: bool
+    ) -> Tuple[Optional[CacheEntry], bool]:
+        """Returns the stored response matching a request and whether it is fresh enough to be served directly.
+
+        A stale entry (or one the request asks to revalidate) is returned with False, it can be revalidated with
+        ``validators()``. ``(None, False)`` is returned if there is no usable entry.
+        """
+        if method != "GET":
+            return None, False
+        lower_headers = {name.lower(): value for name, value in headers.items()}
+        request_cache_control = _parse_cache_control(lower_headers.get("cache-control"))
+        if "no-store" in request_cache_control:
+            return None, False
+
+        entry = self._get((method, url, is_byte_response))
+        if entry is None or not self._vary_matches(entry, lower_headers, request_cookies):
+            self._count("misses")
+            return None, False
+
+        age = entry.current_age(time.time())
+        max_age = _parse_seconds(request_cache_control.get("max-age"))
+        if (
+            "no-cache" in request_cache_control or lower_headers.get("pragma") == "no-cache" or entry.no_cache
+            or age >= entry.freshness_lifetime or (max_age is not None and age > max_age)
+        ):
+            self._count("stale")
+            return entry, False
+        self._count("hits")
+        return entry, True
+
+    def _vary_matches(self, entry: CacheEntry, lower_headers: Dict[str, str], request_cookies: bytes) -> bool:
+        for name, value in entry.vary.items():
+            current = request_cookies.decode("utf-8") if name == "cookie" else lower_headers.get(name)
+            if current != value:
+                return False
+        return True
+
+    def store(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        request_cookies: bytes,
+        is_byte_response: bool,
+        raw: dict,
+        request_time: float
+    ) -> None:
+        """Stores the response to a request if it is storable (RFC 9111, section 3), invalidates the stored response of
+        the url after a successful unsafe request"""
+        status = raw["status"]
+        if method in UNSAFE_METHODS:
+            if status < 400:
+                self.invalidate(url)
+            return
+        # partial content, interim responses and 304 (it answers a conditional request, see `revalidated`) are never
+        # stored
+        if method != "GET" or status < 200 or status in (206, 304):
+            return
+
+        response_headers = raw["headers"]
+        cache_control = _parse_cache_control(_header(response_headers, "cache-control"))
+        lower_headers = {name.lower(): value for name, value in headers.items()}
+        if "no-store" in cache_control or "no-store" in _parse_cache_control(lower_headers.get("cache-control")):
+            return
+        vary = {}
+        for name in (_header(response_headers, "vary") or "").split(","):
+            name = name.strip().lower()
+            if name == "*":
+                return
+            if name:
+                vary[name] = request_cookies.decode("utf-8") if name == "cookie" else lower_headers.get(name)
+
+        raw = {name: raw.get(name) for name in ("target", "status", "headers", "body", "usedProtocol")}
+        entry = CacheEntry((method, url, is_byte_response), raw, vary, request_time, time.time())
+        explicitly_fresh = "max-age" in cache_control or _header(response_headers, "expires") is not None
+        if status not in HEURISTICALLY_CACHEABLE and not explicitly_fresh:
+            return
+        if entry.freshness_lifetime <= 0 and not entry.validators():
+            # could never be served
+            return
+        self._put(entry)
+        self._count("stored")
+
+    def conditional_headers(self, entry: CacheEntry, headers: Dict[str, str]) -> Dict[str, str]:
+        """Returns the request headers with the validators of a stale entry, validators set by the caller are kept"""
+        lower_names = {name.lower() for name in headers}
+        conditional = dict(headers)
+        for name, value in entry.validators().items():
+            if name.lower() not in lower_names:
+                conditional[name] = value
+        return conditional
+
+    def revalidated(self, entry: CacheEntry, raw: dict, request_time: float) -> dict:
+        """Updates a stored response with the headers of a 304 response and returns the response to serve"""
+        headers = dict(entry.raw["headers"])
+        lower_names = {name.lower(): name for name in headers}
+        for name, values in raw["headers"].items():
+            lower_name = name.lower()
+            if lower_name in _NOT_UPDATED_HEADERS:
+                continue
+            headers.pop(lower_names.get(lower_name, name), None)
+            headers[name] = values
+        updated = CacheEntry(entry.key, {**entry.raw, "headers": headers}, entry.vary, request_time, time.time())
+        self._put(updated)
+        self._count("revalidated")
+        return self.serve(updated)
+
+    def serve(self, entry: CacheEntry) -> dict:
+        """Returns a copy of the stored response with its current Age header"""
+        headers = {name: values for name, values in entry.raw["headers"].items() if name.lower() != "age"}
+        headers["Age"] = [str(int(entry.current_age(time.time())))]
+        return {**entry.raw, "headers": headers}
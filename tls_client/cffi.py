@@ -1,6 +1,11 @@
+from .exceptions import TLSClientExeption
+
 from sys import platform
 from platform import machine
+from typing import Optional
+import threading
 import ctypes
+import re
 import os
 
 
@@ -17,17 +22,120 @@ else:
         file_ext = '-amd64.so'
 
 root_dir = os.path.abspath(os.path.dirname(__file__))
-library = ctypes.cdll.LoadLibrary(f'{root_dir}/dependencies/tls-client{file_ext}')
+# TLS_CLIENT_LIBRARY_PATH loads another build of the shared library (e.g. the stub of the benchmarks)
+library_path = os.environ.get("TLS_CLIENT_LIBRARY_PATH") or f'{root_dir}/dependencies/tls-client{file_ext}'
+
+# The shared library is loaded on first use, so importing tls_client does not start the Go runtime
+_library = None
+_library_lock = threading.Lock()
+# set in a child process forked after the library has been loaded, see `_after_fork`
+_loaded_before_fork = False
+
+
+def set_library_path(path: str) -> None:
+    """Sets the shared library which is loaded on first use, it can not be changed once it has been loaded"""
+    global library_path
+    with _library_lock:
+        if _library is not None and path != library_path:
+            raise TLSClientExeption(f"the shared library has already been loaded from {library_path}")
+        library_path = path
+
+
+def get_library_path() -> str:
+    """Returns the path of the shared library"""
+    return library_path
+
+
+def is_loaded() -> bool:
+    """Returns whether the shared library has been loaded in this process"""
+    return _library is not None
+
+
+def load_library() -> ctypes.CDLL:
+    """Loads the shared library (once, thread-safe) and returns it"""
+    global _library
+    if _library is not None:
+        return _library
+    with _library_lock:
+        if _library is not None:
+            return _library
+        if _loaded_before_fork:
+            # the threads of the Go runtime do not exist in the child, every call would hang or crash
+            raise TLSClientExeption(
+                "the tls-client shared library was loaded before this process was forked and can not be used in the "
+                "child process. Send the first request after forking (e.g. in the worker init of a pre-fork server) "
+                "or use the 'spawn' start method."
+            )
+        library = ctypes.cdll.LoadLibrary(library_path)
+
+        # extract the exposed functions from the shared package
+        library.request.argtypes = [ctypes.c_char_p]
+        library.request.restype = ctypes.c_void_p
+
+        library.freeMemory.argtypes = [ctypes.c_char_p]
+        library.freeMemory.restype = ctypes.c_char_p
+
+        library.destroySession.argtypes = [ctypes.c_char_p]
+        library.destroySession.restype = ctypes.c_void_p
+
+        library.destroyAll.argtypes = []
+        library.destroyAll.restype = ctypes.c_void_p
+
+        _library = library
+        return library
+
+
+def _after_fork() -> None:
+    global _library, _loaded_before_fork
+    if _library is not None:
+        _library = None
+        _loaded_before_fork = True
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def __getattr__(name: str):
+    # `library` used to be loaded at import time
+    if name == "library":
+        return load_library()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def request(payload: bytes) -> Optional[int]:
+    return (_library or load_library()).request(payload)
+
+
+def freeMemory(response_id: bytes) -> Optional[bytes]:
+    return (_library or load_library()).freeMemory(response_id)
+
+
+def destroySession(payload: bytes) -> Optional[int]:
+    return (_library or load_library()).destroySession(payload)
+
+
+def destroyAll() -> Optional[int]:
+    return (_library or load_library()).destroyAll()
+
+
+# the id is the first member of every response, it can not occur unescaped inside a json string
+_response_id = re.compile(rb'"id"\s*:\s*"([^"]*)"')
 
-# extract the exposed request function from the shared package
-request = library.request
-request.argtypes = [ctypes.c_char_p]
-request.restype = ctypes.c_char_p
 
-freeMemory = library.freeMemory
-freeMemory.argtypes = [ctypes.c_char_p]
-freeMemory.restype = ctypes.c_char_p
+def call(function, *args) -> bytes:
+    """Calls a function of the shared library and returns its json response.
 
-destroySession = library.destroySession
-destroySession.argtypes = [ctypes.c_char_p]
-destroySession.restype = ctypes.c_char_p
+    The functions return a pointer to memory owned by the shared library. It is copied exactly once into the returned
+    bytes (which the json codecs parse directly) and freed right away, so it is freed even if parsing fails. The id
+    needed to free it is read from the copy, if copying fails the memory is not freed.
+    """
+    pointer = function(*args)
+    response = b""
+    try:
+        response = ctypes.string_at(pointer)
+        return response
+    finally:
+        response_id = _response_id.search(response)
+        if response_id is not None:
+            freeMemory(response_id.group(1))
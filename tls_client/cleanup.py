@@ -0,0 +1,158 @@
+from .cffi import destroySession, destroyAll, call, is_loaded
+from .json_codecs import JSONCodec, get_codec
+
+from typing import Any, Dict, Optional
+import threading
+import weakref
+import atexit
+import time
+
+
+# Sessions which have not been closed yet
+_sessions = weakref.WeakSet()
+_stats_lock = threading.Lock()
+_stats = {
+    # sessions created
+    "created": 0,
+    # sessions destroyed by `Session.close`
+    "closed": 0,
+    # sessions destroyed because they were garbage collected without being closed
+    "collected": 0,
+    # times the reaper destroyed the state of an idle session in the shared library
+    "reaped": 0,
+}
+_reaper = None
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def destroy_session(session_id: str, codec: Optional[JSONCodec] = None) -> str:
+    """Destroys the client of a session and its connections in the shared library"""
+    codec = codec or get_codec()
+    if not is_loaded():
+        # the session never sent a request, there is nothing to destroy and no reason to load the library
+        return codec.dumps({"success": True}).decode("utf-8")
+    # copies the response of the tls client and frees its memory
+    destroy_session_response_bytes = call(destroySession, codec.dumps({"sessionId": session_id}))
+    # convert our byte array to a string (tls client returns json)
+    return destroy_session_response_bytes.decode('utf-8')
+
+
+def _destroy_collected_session(session_id: str) -> None:
+    _count("collected")
+    try:
+        destroy_session(session_id)
+    except Exception:
+        # finalizers must never raise
+        pass
+
+
+def track(session: Any, reopened: bool = False) -> weakref.finalize:
+    """Registers a session, its state in the shared library is destroyed when it is garbage collected.
+
+    Returns the finalizer, ``Session.close`` detaches it. ``reopened`` registers a closed session which is used again,
+    it is counted as alive again instead of as a new session.
+    """
+    finalizer = weakref.finalize(session, _destroy_collected_session, session._session_id)
+    # at exit everything is destroyed at once by `destroy_all`
+    finalizer.atexit = False
+    with _stats_lock:
+        if session not in _sessions:
+            _sessions.add(session)
+            if reopened:
+                _stats["closed"] -= 1
+            else:
+                _stats["created"] += 1
+    return finalizer
+
+
+def untrack(session: Any) -> None:
+    """Unregisters a closed session, closing it again is not counted"""
+    with _stats_lock:
+        if session in _sessions:
+            _sessions.discard(session)
+            _stats["closed"] += 1
+
+
+@atexit.register
+def destroy_all() -> None:
+    """Destroys all sessions in the shared library, called when the process exits"""
+    stop_reaper()
+    if not is_loaded():
+        return
+    try:
+        call(destroyAll)
+    except Exception:
+        pass
+
+
+class SessionReaper(threading.Thread):
+    """Background thread, which destroys the state (client and pooled connections) in the shared library of sessions
+    which have been idle for longer than ``ttl`` seconds.
+
+    A reaped session stays usable, the shared library creates a new client on its next request. A session is never
+    considered idle before its ``timeout_seconds`` have passed, so requests in flight are not affected.
+    """
+
+    def __init__(self, ttl: float, interval: Optional[float] = None):
+        super().__init__(name="tls-client-reaper", daemon=True)
+        self.ttl = ttl
+        self.interval = interval if interval is not None else max(min(ttl / 2, 60), 1)
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.reap()
+
+    def reap(self) -> int:
+        """Destroys the state of all idle sessions, returns how many were reaped"""
+        now = time.monotonic()
+        reaped = 0
+        for session in list(_sessions):
+            try:
+                if not session._native_active:
+                    continue
+                idle = now - session._last_used
+                if idle <= self.ttl or idle <= (session.timeout_seconds or 0):
+                    continue
+                session._native_active = False
+                destroy_session(session._session_id)
+            except Exception:
+                # one broken session must not stop the reaper thread
+                continue
+            _count("reaped")
+            reaped += 1
+        return reaped
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_reaper(ttl: float, interval: Optional[float] = None) -> SessionReaper:
+    """Starts the idle session reaper (replacing a running one)"""
+    global _reaper
+    stop_reaper()
+    _reaper = SessionReaper(ttl, interval)
+    _reaper.start()
+    return _reaper
+
+
+def stop_reaper() -> None:
+    """Stops the idle session reaper, if it is running"""
+    global _reaper
+    if _reaper is not None:
+        _reaper.stop()
+        _reaper = None
+
+
+def stats() -> Dict[str, int]:
+    """Returns counts of the session lifecycle for monitoring"""
+    with _stats_lock:
+        counts = dict(_stats)
+    counts["alive"] = len(_sessions)
+    counts["active"] = sum(1 for session in list(_sessions) if getattr(session, "_native_active", False))
+    counts["reaper_running"] = int(_reaper is not None and _reaper.is_alive())
+    return counts
@@ -1,10 +1,10 @@
 from .structures import CaseInsensitiveDict
 
 from http.cookiejar import CookieJar, Cookie
-from typing import MutableMapping, Union, Any
+from typing import MutableMapping, Union, Any, List, Optional
 from urllib.parse import urlparse, urlunparse
-from http.client import HTTPMessage
 import copy
+import time
 
 try:
     import threading
@@ -12,45 +12,63 @@ except ImportError:
     import dummy_threading as threading
 
 
+def _get_host_header(headers) -> Optional[str]:
+    if not headers:
+        return None
+    if isinstance(headers, CaseInsensitiveDict):
+        return headers.get("Host")
+    for key, value in headers.items():
+        if key.lower() == "host":
+            return value
+    return None
+
+
 class MockRequest:
     """
     Mimic a urllib2.Request to get the correct cookie string for the request.
+    The url is only parsed once, cookielib calls these methods several times per cookie.
     """
 
+    __slots__ = ("request_url", "request_headers", "type", "_parsed", "_full_url", "_new_headers")
+
     def __init__(self, request_url: str, request_headers: CaseInsensitiveDict):
         self.request_url = request_url
         self.request_headers = request_headers
+        self._parsed = urlparse(request_url)
+        self._full_url = None
         self._new_headers = {}
-        self.type = urlparse(self.request_url).scheme
+        self.type = self._parsed.scheme
 
     def get_type(self):
         return self.type
 
     def get_host(self):
-        return urlparse(self.request_url).netloc
+        return self._parsed.netloc
 
     def get_origin_req_host(self):
         return self.get_host()
 
     def get_full_url(self):
-        # Only return the response's URL if the user hadn't set the Host
-        # header
-        if not self.request_headers.get("Host"):
-            return self.request_url
-        # If they did set it, retrieve it and reconstruct the expected domain
-        host = self.request_headers["Host"]
-        parsed = urlparse(self.request_url)
-        # Reconstruct the URL as we expect it
-        return urlunparse(
-            [
-                parsed.scheme,
-                host,
-                parsed.path,
-                parsed.params,
-                parsed.query,
-                parsed.fragment,
-            ]
-        )
+        if self._full_url is None:
+            # Only return the response's URL if the user hadn't set the Host
+            # header
+            host = _get_host_header(self.request_headers)
+            if not host:
+                self._full_url = self.request_url
+            else:
+                # If they did set it, reconstruct the expected domain
+                parsed = self._parsed
+                self._full_url = urlunparse(
+                    [
+                        parsed.scheme,
+                        host,
+                        parsed.path,
+                        parsed.params,
+                        parsed.query,
+                        parsed.fragment,
+                    ]
+                )
+        return self._full_url
 
     def is_unverifiable(self):
         return True
@@ -82,18 +100,20 @@ class MockRequest:
 
 class MockResponse:
     """
-    Wraps a httplib.HTTPMessage to mimic a urllib.addinfourl.
-    The objective is to retrieve the response cookies correctly.
+    Mimics a urllib.addinfourl and the httplib.HTTPMessage it returns from info(),
+    with only the headers the cookielib reads: Set-Cookie and Set-Cookie2.
     """
 
-    def __init__(self, headers):
+    __slots__ = ("_headers",)
+
+    def __init__(self, headers: dict):
         self._headers = headers
 
     def info(self):
-        return self._headers
+        return self
 
-    def getheaders(self, name):
-        self._headers.getheaders(name)
+    def get_all(self, name, default=None):
+        return self._headers.get(name, default)
 
 
 class CookieConflictError(RuntimeError):
@@ -118,15 +138,21 @@ class RequestsCookieJar(CookieJar, MutableMapping):
 
     Unlike a regular CookieJar, this class is pickleable.
 
-    .. warning:: dictionary operations that are normally O(1) may be O(n).
+    Besides the ``domain -> path -> name`` storage of ``CookieJar``, the jar
+    keeps a ``name -> domain -> path`` index, so lookups by name don't have to
+    scan every cookie.
     """
 
+    def __init__(self, policy=None):
+        super().__init__(policy)
+        self._index = {}
+        # incremented on every change, lets callers cache what they derived from the jar
+        self._version = 0
+
     def get(self, name, default=None, domain=None, path=None):
         """Dict-like get() that also supports optional domain and path args in
         order to resolve naming collisions from using one cookie jar over
         multiple domains.
-
-        .. warning:: operation is O(n), not O(1).
         """
         try:
             return self._find_no_duplicates(name, domain, path)
@@ -203,11 +229,11 @@ class RequestsCookieJar(CookieJar, MutableMapping):
 
     def list_domains(self):
         """Utility method to list all the domains in the jar."""
-        domains = []
-        for cookie in iter(self):
-            if cookie.domain not in domains:
-                domains.append(cookie.domain)
-        return domains
+        with self._cookies_lock:
+            return [
+                domain for domain in sorted(self._cookies)
+                if any(self._cookies[domain].values())
+            ]
 
     def list_paths(self):
         """Utility method to list all the paths in the jar."""
@@ -223,11 +249,10 @@ class RequestsCookieJar(CookieJar, MutableMapping):
 
         :rtype: bool
         """
-        domains = []
-        for cookie in iter(self):
-            if cookie.domain is not None and cookie.domain in domains:
-                return True
-            domains.append(cookie.domain)
+        with self._cookies_lock:
+            for domain, paths in self._cookies.items():
+                if domain is not None and sum(len(names) for names in paths.values()) > 1:
+                    return True
         return False  # there is only one domain in jar
 
     def get_dict(self, domain=None, path=None):
@@ -256,7 +281,6 @@ class RequestsCookieJar(CookieJar, MutableMapping):
         exception if there are more than one cookie with name. In that case,
         use the more explicit get() method instead.
 
-        .. warning:: operation is O(n), not O(1).
         """
         return self._find_no_duplicates(name)
 
@@ -280,7 +304,59 @@ class RequestsCookieJar(CookieJar, MutableMapping):
             and cookie.value.endswith('"')
         ):
             cookie.value = cookie.value.replace('\\"', "")
-        return super().set_cookie(cookie, *args, **kwargs)
+        with self._cookies_lock:
+            super().set_cookie(cookie, *args, **kwargs)
+            self._index.setdefault(cookie.name, {}).setdefault(cookie.domain, {})[cookie.path] = cookie
+            self._version += 1
+
+    def clear(self, domain=None, path=None, name=None):
+        """Clear some cookies, see ``cookielib.CookieJar.clear``."""
+        with self._cookies_lock:
+            if name is not None:
+                super().clear(domain, path, name)
+                self._unindex(name, domain, path)
+            elif domain is not None:
+                if path is not None:
+                    removed = list(self._cookies.get(domain, {}).get(path, {}).values())
+                else:
+                    removed = [
+                        cookie for names in self._cookies.get(domain, {}).values() for cookie in names.values()
+                    ]
+                super().clear(domain, path, name)
+                for cookie in removed:
+                    self._unindex(cookie.name, cookie.domain, cookie.path)
+            else:
+                super().clear()
+                self._index = {}
+            self._version += 1
+
+    def _unindex(self, name, domain, path):
+        domains = self._index.get(name)
+        if domains is None:
+            return
+        paths = domains.get(domain)
+        if paths is None:
+            return
+        paths.pop(path, None)
+        if not paths:
+            del domains[domain]
+            if not domains:
+                del self._index[name]
+
+    def _find_cookies(self, name, domain=None, path=None):
+        """Returns all cookies with the name, optionally filtered by domain and path."""
+        with self._cookies_lock:
+            domains = self._index.get(name)
+            if not domains:
+                return []
+            if domain is not None:
+                domains = {domain: domains[domain]} if domain in domains else {}
+            return [
+                cookie
+                for paths in domains.values()
+                for cookie_path, cookie in paths.items()
+                if path is None or cookie_path == path
+            ]
 
     def update(self, other):
         """Updates this jar with cookies from another CookieJar or dict-like"""
@@ -302,11 +378,8 @@ class RequestsCookieJar(CookieJar, MutableMapping):
         :param path: (optional) string containing path of cookie
         :return: cookie.value
         """
-        for cookie in iter(self):
-            if cookie.name == name:
-                if domain is None or cookie.domain == domain:
-                    if path is None or cookie.path == path:
-                        return cookie.value
+        for cookie in self._find_cookies(name, domain, path):
+            return cookie.value
 
         raise KeyError(f"name={name!r}, domain={domain!r}, path={path!r}")
 
@@ -323,17 +396,14 @@ class RequestsCookieJar(CookieJar, MutableMapping):
         :return: cookie.value
         """
         toReturn = None
-        for cookie in iter(self):
-            if cookie.name == name:
-                if domain is None or cookie.domain == domain:
-                    if path is None or cookie.path == path:
-                        if toReturn is not None:
-                            # if there are multiple cookies that meet passed in criteria
-                            raise CookieConflictError(
-                                f"There are multiple cookies with name, {name!r}"
-                            )
-                        # we will eventually return this as long as no cookie conflict
-                        toReturn = cookie.value
+        for cookie in self._find_cookies(name, domain, path):
+            if toReturn is not None:
+                # if there are multiple cookies that meet passed in criteria
+                raise CookieConflictError(
+                    f"There are multiple cookies with name, {name!r}"
+                )
+            # we will eventually return this as long as no cookie conflict
+            toReturn = cookie.value
 
         if toReturn:
             return toReturn
@@ -351,6 +421,13 @@ class RequestsCookieJar(CookieJar, MutableMapping):
         self.__dict__.update(state)
         if "_cookies_lock" not in self.__dict__:
             self._cookies_lock = threading.RLock()
+        if "_version" not in self.__dict__:
+            self._version = 0
+        if "_index" not in self.__dict__:
+            # pickled by a version without the index
+            self._index = {}
+            for cookie in iter(self):
+                self._index.setdefault(cookie.name, {}).setdefault(cookie.domain, {})[cookie.path] = cookie
 
     def copy(self):
         """Return a copy of this RequestsCookieJar."""
@@ -366,6 +443,11 @@ class RequestsCookieJar(CookieJar, MutableMapping):
 
 def remove_cookie_by_name(cookiejar: RequestsCookieJar, name: str, domain: str = None, path: str = None):
     """Removes a cookie by name, by default over all domains and paths."""
+    if isinstance(cookiejar, RequestsCookieJar):
+        for cookie in cookiejar._find_cookies(name, domain, path):
+            cookiejar.clear(cookie.domain, cookie.path, cookie.name)
+        return
+
     clearables = []
     for cookie in cookiejar:
         if cookie.name != name:
@@ -380,6 +462,104 @@ def remove_cookie_by_name(cookiejar: RequestsCookieJar, name: str, domain: str =
         cookiejar.clear(domain, path, name)
 
 
+def _domain_match(host: str, cookie: Cookie) -> bool:
+    domain = cookie.domain
+    if not domain:
+        # cookies without domain (e.g. from a dict) are sent to every host
+        return True
+    if cookie.domain_specified or domain.startswith("."):
+        domain = domain.lstrip(".")
+        return host == domain or host.endswith("." + domain)
+    # host-only cookie, the cookielib stores hosts without dots with a ".local" suffix
+    return host == domain or (host + ".local") == domain
+
+
+def _path_match(request_path: str, cookie_path: Optional[str]) -> bool:
+    if not cookie_path or cookie_path == request_path:
+        return True
+    if request_path.startswith(cookie_path):
+        return cookie_path.endswith("/") or request_path[len(cookie_path)] == "/"
+    return False
+
+
+def get_cookies_for_url(cookie_jar: CookieJar, scheme: str, host: str, path: str, now: Optional[float] = None) -> List[Cookie]:
+    """Returns the cookies of the jar, which have to be sent to the url, following the domain, path, secure and
+    expiry rules of RFC 6265.
+
+    :param host: lowercase host name without port
+    :param path: path of the url, "/" if it is empty
+    """
+    now = int(now if now is not None else time.time())
+    secure = scheme in ("https", "wss")
+    if isinstance(cookie_jar, CookieOverlay):
+        return cookie_jar.get_request_cookies_for_url(scheme, host, path, now) + [
+            cookie for cookie in get_cookies_for_url(cookie_jar.jar, scheme, host, path, now)
+            if cookie.name not in cookie_jar.names
+        ]
+
+    cookies = []
+    with cookie_jar._cookies_lock:
+        for domain, paths in cookie_jar._cookies.items():
+            for cookie_path, names in paths.items():
+                if not _path_match(path, cookie_path):
+                    continue
+                for cookie in names.values():
+                    if cookie.secure and not secure:
+                        continue
+                    if cookie.is_expired(now):
+                        continue
+                    if not _domain_match(host, cookie):
+                        continue
+                    cookies.append(cookie)
+    return cookies
+
+
+def _cookie_match(cookie: Cookie, secure: bool, host: str, path: str, now: int) -> bool:
+    return (
+        (secure or not cookie.secure)
+        and not cookie.is_expired(now)
+        and _path_match(path, cookie.path)
+        and _domain_match(host, cookie)
+    )
+
+
+class CookieOverlay:
+    """The cookies of a single request layered over the session's jar.
+
+    Iterating yields the request cookies first, then the cookies of the jar, which are not shadowed by a request
+    cookie with the same name. Neither side is copied. Cookies set on the overlay (e.g. by ``extract_cookies_to_jar``)
+    are stored in the jar, the request cookies never are, so they don't leak into later requests.
+    """
+
+    __slots__ = ("jar", "request_cookies", "names")
+
+    def __init__(self, jar: CookieJar, cookies: Union[dict, CookieJar]):
+        self.jar = jar
+        if isinstance(cookies, CookieJar):
+            self.request_cookies = list(cookies)
+        else:
+            self.request_cookies = [create_cookie(name=name, value=value) for name, value in cookies.items()]
+        self.names = {cookie.name for cookie in self.request_cookies}
+
+    def __iter__(self):
+        yield from self.request_cookies
+        for cookie in self.jar:
+            if cookie.name not in self.names:
+                yield cookie
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def get_request_cookies_for_url(self, scheme: str, host: str, path: str, now: Optional[float] = None) -> List[Cookie]:
+        """Returns the request cookies which have to be sent to the url, see ``get_cookies_for_url``"""
+        now = int(now if now is not None else time.time())
+        secure = scheme in ("https", "wss")
+        return [cookie for cookie in self.request_cookies if _cookie_match(cookie, secure, host, path, now)]
+
+    def set_cookie(self, cookie: Cookie):
+        self.jar.set_cookie(cookie)
+
+
 def create_cookie(name: str, value: str, **kwargs: Any) -> Cookie:
     """Make a cookie from underspecified parameters."""
     result = {
@@ -435,22 +615,28 @@ def merge_cookies(cookiejar: RequestsCookieJar, cookies: Union[dict, RequestsCoo
 def extract_cookies_to_jar(
         request_url: str,
         request_headers: CaseInsensitiveDict,
-        cookie_jar: RequestsCookieJar,
+        cookie_jar: Union[RequestsCookieJar, CookieOverlay],
         response_headers: dict
-    ) -> RequestsCookieJar:
-    response_cookie_jar = cookiejar_from_dict({})
-
-    req = MockRequest(request_url, request_headers)
-    # mimic HTTPMessage
-    http_message = HTTPMessage()
-    http_message._headers = []
-    for header_name, header_values in response_headers.items():
-        for header_value in header_values:
-            http_message._headers.append(
-                (header_name, header_value)
-            )
-    res = MockResponse(http_message)
-    response_cookie_jar.extract_cookies(res, req)
+    ) -> Optional[RequestsCookieJar]:
+    """Adds the cookies set by the response to the jar and returns them in a new jar.
 
-    merge_cookies(cookie_jar, response_cookie_jar)
+    Returns None without doing any work if the response has no Set-Cookie header, which is the case for most
+    responses. Otherwise the Set-Cookie headers are handed to the cookielib directly, so the parsing and the
+    acceptance rules (``DefaultCookiePolicy``) are the same as for ``CookieJar.extract_cookies``.
+    """
+    if not response_headers:
+        return None
+    set_cookie_headers = {}
+    for header_name in ("Set-Cookie", "set-cookie", "Set-Cookie2", "set-cookie2"):
+        header_values = response_headers.get(header_name)
+        if header_values:
+            set_cookie_headers.setdefault(header_name.title(), []).extend(header_values)
+    if not set_cookie_headers:
+        return None
+
+    response_cookie_jar = cookiejar_from_dict(None)
+    response_cookie_jar.extract_cookies(MockResponse(set_cookie_headers), MockRequest(request_url, request_headers))
+
+    for cookie in response_cookie_jar:
+        cookie_jar.set_cookie(cookie)
     return response_cookie_jar
@@ -0,0 +1,39 @@
+"""Origin: requests library (https://github.com/psf/requests)
+
+This module provides the capabilities for the hook system of a session.
+
+Available hooks:
+
+``pre_request``:
+    The request payload (dict) before it is serialized and sent to the shared library.
+    Called as ``hook(request, session=session)``.
+``post_response``:
+    The response generated from a request, ``response.timings`` contains the durations of the phases.
+    Called as ``hook(response, session=session, request=request)``.
+``on_error``:
+    The exception raised by the native call or while processing its response (e.g. ``TLSClientExeption``).
+    Called as ``hook(exception, session=session, request=request, timings=timings)``.
+
+A hook which returns something other than None replaces the data passed to the following hooks (and, for
+``pre_request`` and ``post_response``, the request payload / response itself).
+"""
+from typing import Any, Callable, Dict, List
+
+HOOKS = ["pre_request", "post_response", "on_error"]
+
+
+def default_hooks() -> Dict[str, List[Callable]]:
+    return {event: [] for event in HOOKS}
+
+
+def dispatch_hook(key: str, hooks: Dict[str, List[Callable]], hook_data: Any, **kwargs: Any) -> Any:
+    """Dispatches a hook dictionary on a given piece of data."""
+    hooks = hooks.get(key)
+    if hooks:
+        if hasattr(hooks, "__call__"):
+            hooks = [hooks]
+        for hook in hooks:
+            _hook_data = hook(hook_data, **kwargs)
+            if _hook_data is not None:
+                hook_data = _hook_data
+    return hook_data
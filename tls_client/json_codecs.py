@@ -0,0 +1,134 @@
+from typing import Any, Optional, Union
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class JSONCodec:
+    """Serializes the payloads sent to the shared library and parses its responses.
+
+    ``dumps`` returns bytes, ``loads`` accepts bytes or str and raises ``json.JSONDecodeError`` (a ``ValueError``) for
+    invalid input.
+    """
+
+    name = None
+
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} [{self.name}]>"
+
+
+class StdlibCodec(JSONCodec):
+    """Codec using the json module of the standard library"""
+
+    name = "json"
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """Codec using orjson (https://github.com/ijl/orjson)"""
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+
+class MsgspecCodec(JSONCodec):
+    """Codec using msgspec (https://github.com/jcrist/msgspec)"""
+
+    name = "msgspec"
+
+    def __init__(self):
+        if msgspec is None:
+            raise ImportError("msgspec is not installed")
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        try:
+            return self._decoder.decode(data)
+        except msgspec.DecodeError as e:
+            # same exception as the other codecs (orjson.JSONDecodeError is a subclass)
+            document = data.decode("utf-8", "replace") if isinstance(data, (bytes, bytearray)) else data
+            raise json.JSONDecodeError(str(e), document, 0) from None
+
+
+codecs = {
+    StdlibCodec.name: StdlibCodec,
+    OrjsonCodec.name: OrjsonCodec,
+    MsgspecCodec.name: MsgspecCodec,
+}
+
+
+def _fastest_available_codec() -> JSONCodec:
+    if orjson is not None:
+        return OrjsonCodec()
+    if msgspec is not None:
+        return MsgspecCodec()
+    return StdlibCodec()
+
+
+_default_codec = _fastest_available_codec()
+# codec chosen with `set_default_codec`, see `get_response_codec`
+_chosen_default_codec: Optional[JSONCodec] = None
+_stdlib_codec = StdlibCodec()
+
+
+def get_codec(codec: Optional[Union[str, JSONCodec]] = None) -> JSONCodec:
+    """Returns a codec instance for a codec name ("json", "orjson", "msgspec") or the default codec for None"""
+    if codec is None:
+        return _default_codec
+    if isinstance(codec, JSONCodec):
+        return codec
+    try:
+        return codecs[codec]()
+    except KeyError:
+        raise ValueError(f"unknown json codec {codec!r}, available codecs: {list(codecs)}") from None
+
+
+def set_default_codec(codec: Union[str, JSONCodec]) -> None:
+    """Sets the codec used by sessions and responses which do not specify one.
+
+    By default orjson is used when it is installed, then msgspec, otherwise the json module of the standard library.
+    """
+    global _default_codec, _chosen_default_codec
+    _default_codec = _chosen_default_codec = get_codec(codec)
+
+
+def get_response_codec(codec: Optional[JSONCodec] = None) -> JSONCodec:
+    """Returns the codec of ``Response.json()``: the codec chosen for the session or with ``set_default_codec``,
+    otherwise the json module.
+
+    The faster codecs are not used implicitly, because their results differ for some documents (e.g. orjson parses
+    integers beyond 64 bits as floats).
+    """
+    return codec or _chosen_default_codec or _stdlib_codec
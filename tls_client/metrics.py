@@ -0,0 +1,239 @@
+from .exceptions import TLSClientExeption
+from .response import Response
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import urllib.parse
+import threading
+import bisect
+import math
+
+
+# Upper bounds of the latency histogram buckets in seconds, the last bucket (+Inf) is implicit
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LABELS = ("host", "status_class", "method", "client_identifier", "proxy")
+
+
+def _proxy_label(proxy: str) -> str:
+    """Returns the proxy without credentials, e.g. "http://user:pass@ip:port" -> "http://ip:port" """
+    if not proxy:
+        return ""
+    url = urllib.parse.urlsplit(proxy)
+    if url.username is None and url.password is None:
+        return proxy
+    return f"{url.scheme}://{url.netloc.rpartition('@')[2]}"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Series:
+    """Counters and the latency histogram of one label set"""
+
+    __slots__ = ("count", "errors", "cache_hits", "sum", "buckets")
+
+    def __init__(self, bucket_count: int):
+        self.count = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.sum = 0.0
+        # non-cumulative counts, one per bucket plus +Inf
+        self.buckets = [0] * (bucket_count + 1)
+
+    def copy(self) -> "_Series":
+        series = _Series(0)
+        series.count, series.errors, series.cache_hits = self.count, self.errors, self.cache_hits
+        series.sum, series.buckets = self.sum, list(self.buckets)
+        return series
+
+
+class MetricsCollector:
+    """Collects request counters and latency histograms of the sessions attached to it.
+
+    The series are broken down by host, status class ("2xx", "4xx", ..., "error"), method, client identifier and
+    proxy (without credentials), responses served from the HTTP cache are counted as cache hits. Updates only lock
+    one of ``stripes`` locks, chosen by the labels, so sessions on many threads rarely contend. Latencies
+    (``Response.timings["total"]``) go into fixed buckets, percentiles are estimated from them.
+
+    Usage::
+
+        metrics = tls_client.MetricsCollector()
+        session = tls_client.Session(client_identifier="chrome_120", metrics=metrics)
+        # or metrics.attach(session)
+
+        metrics.snapshot()    # dict
+        metrics.prometheus()  # Prometheus text format
+        metrics.serve(9100)   # http://127.0.0.1:9100/metrics
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, stripes: int = 16) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._stripes: List[Tuple[threading.Lock, Dict[tuple, _Series]]] = [
+            (threading.Lock(), {}) for _ in range(stripes)
+        ]
+        self._server = None
+
+    # --- Recording ----------------------------------------------------------------------------------------------------
+
+    def record(self, labels: tuple, seconds: Optional[float], error: bool = False, cache_hit: bool = False) -> None:
+        """Records one request, ``labels`` are the values of ``LABELS``"""
+        lock, series = self._stripes[hash(labels) % len(self._stripes)]
+        bucket = bisect.bisect_left(self.buckets, seconds) if seconds is not None else None
+        with lock:
+            entry = series.get(labels)
+            if entry is None:
+                entry = series[labels] = _Series(len(self.buckets))
+            entry.count += 1
+            if error:
+                entry.errors += 1
+            if cache_hit:
+                entry.cache_hits += 1
+            if bucket is not None:
+                entry.sum += seconds
+                entry.buckets[bucket] += 1
+
+    def _labels(self, session: Any, request: dict, status_class: str) -> tuple:
+        return (
+            urllib.parse.urlsplit(request["requestUrl"]).hostname or "",
+            status_class,
+            request["requestMethod"],
+            session.client_identifier or "custom",
+            _proxy_label(request["proxyUrl"]),
+        )
+
+    def _on_response(self, response: Response, session: Any = None, request: Optional[dict] = None, **kwargs: Any):
+        labels = self._labels(session, request, f"{response.status_code // 100}xx")
+        self.record(labels, response.timings.get("total"), cache_hit=response.from_cache)
+
+    def _on_error(self, exception: Exception, session: Any = None, request: Optional[dict] = None, **kwargs: Any):
+        if isinstance(exception, TLSClientExeption):
+            timings = kwargs.get("timings") or {}
+            self.record(self._labels(session, request, "error"), timings.get("total"), error=True)
+
+    def attach(self, session: Any) -> None:
+        """Collects the metrics of the requests of a session"""
+        session.register_hook("post_response", self._on_response)
+        session.register_hook("on_error", self._on_error)
+
+    def detach(self, session: Any) -> None:
+        """Stops collecting the metrics of a session"""
+        session.deregister_hook("post_response", self._on_response)
+        session.deregister_hook("on_error", self._on_error)
+
+    def reset(self) -> None:
+        """Removes all series"""
+        for lock, series in self._stripes:
+            with lock:
+                series.clear()
+
+    # --- Export -------------------------------------------------------------------------------------------------------
+
+    def _collect(self) -> List[Tuple[tuple, _Series]]:
+        collected = []
+        for lock, series in self._stripes:
+            with lock:
+                collected.extend((labels, entry.copy()) for labels, entry in series.items())
+        collected.sort(key=lambda item: item[0])
+        return collected
+
+    def _percentile(self, buckets: List[int], quantile: float) -> Optional[float]:
+        """Estimates a percentile by linear interpolation inside the bucket containing it"""
+        total = sum(buckets)
+        if total == 0:
+            return None
+        rank = quantile * total
+        cumulative = 0
+        for index, count in enumerate(buckets):
+            if count and cumulative + count >= rank:
+                if index == len(self.buckets):
+                    # +Inf bucket, the best estimate is its lower bound
+                    return self.buckets[-1] if self.buckets else math.inf
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns all series as a dict, latencies are in seconds"""
+        series = []
+        for labels, entry in self._collect():
+            item = dict(zip(LABELS, labels))
+            item.update(
+                count=entry.count,
+                errors=entry.errors,
+                cache_hits=entry.cache_hits,
+                latency_sum=entry.sum,
+                p50=self._percentile(entry.buckets, 0.5),
+                p95=self._percentile(entry.buckets, 0.95),
+                p99=self._percentile(entry.buckets, 0.99),
+                buckets=dict(zip([*map(str, self.buckets), "+Inf"], entry.buckets)),
+            )
+            series.append(item)
+        return {"buckets": list(self.buckets), "series": series}
+
+    def prometheus(self) -> str:
+        """Returns all series in the Prometheus text exposition format"""
+        requests = [
+            "# HELP tls_client_requests_total Requests sent by tls_client sessions",
+            "# TYPE tls_client_requests_total counter",
+        ]
+        errors = [
+            "# HELP tls_client_errors_total Requests which raised a TLSClientExeption",
+            "# TYPE tls_client_errors_total counter",
+        ]
+        cache_hits = [
+            "# HELP tls_client_cache_hits_total Responses served from the HTTP cache (including revalidated ones)",
+            "# TYPE tls_client_cache_hits_total counter",
+        ]
+        latency = [
+            "# HELP tls_client_request_duration_seconds Duration of execute_request",
+            "# TYPE tls_client_request_duration_seconds histogram",
+        ]
+        for labels, entry in self._collect():
+            label_text = ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in zip(LABELS, labels))
+            requests.append(f"tls_client_requests_total{{{label_text}}} {entry.count}")
+            if entry.errors:
+                errors.append(f"tls_client_errors_total{{{label_text}}} {entry.errors}")
+            if entry.cache_hits:
+                cache_hits.append(f"tls_client_cache_hits_total{{{label_text}}} {entry.cache_hits}")
+            cumulative = 0
+            for bound, count in zip([*map(repr, self.buckets), "+Inf"], entry.buckets):
+                cumulative += count
+                latency.append(f'tls_client_request_duration_seconds_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            latency.append(f"tls_client_request_duration_seconds_sum{{{label_text}}} {entry.sum!r}")
+            latency.append(f"tls_client_request_duration_seconds_count{{{label_text}}} {cumulative}")
+        return "\n".join(requests + errors + cache_hits + latency) + "\n"
+
+    def serve(self, port: int, address: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serves the Prometheus text format on ``http://<address>:<port>/metrics`` from a daemon thread"""
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = collector.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.stop_serving()
+        self._server = ThreadingHTTPServer((address, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="tls-client-metrics", daemon=True).start()
+        return self._server
+
+    def stop_serving(self) -> None:
+        """Stops the HTTP server started by ``serve``"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
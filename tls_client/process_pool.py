@@ -0,0 +1,198 @@
+from .cookies import cookiejar_from_dict, RequestsCookieJar
+from .response import Response
+from .sessions import Session, _remaining, _deadline_exceeded, _InOrder
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from http.cookiejar import Cookie
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import multiprocessing
+import itertools
+import time
+import os
+
+
+# --- Worker process ---------------------------------------------------------------------------------------------------
+
+_worker_session: Optional[Session] = None
+_worker_parse: Optional[Callable[[Response], Any]] = None
+_worker_threads = 1
+
+
+def _init_worker(session_kwargs: Dict[str, Any], parse: Optional[Callable], threads: int, cookies: List[Cookie]):
+    global _worker_session, _worker_parse, _worker_threads
+    _worker_session = Session(**session_kwargs)
+    for cookie in cookies:
+        _worker_session.cookies.set_cookie(cookie)
+    _worker_parse = parse
+    _worker_threads = threads
+
+
+def _run_chunk(
+    chunk: List[Tuple[int, Union[tuple, dict]]],
+    cookies: Optional[List[Cookie]]
+) -> Tuple[List[Tuple[int, Any]], Optional[List[Cookie]]]:
+    """Sends a chunk of requests with the session of the worker, returns the results and (if requested) the cookies
+    of the session"""
+    session = _worker_session
+    if cookies is not None:
+        for cookie in cookies:
+            session.cookies.set_cookie(cookie)
+
+    indexes = [index for index, _ in chunk]
+    results = []
+    for position, result in session.as_completed((spec for _, spec in chunk), max_workers=_worker_threads):
+        if _worker_parse is not None and isinstance(result, Response):
+            try:
+                result = _worker_parse(result)
+            except Exception as e:
+                result = e
+        results.append((indexes[position], result))
+    return results, list(session.cookies) if cookies is not None else None
+
+
+# --- Pool -------------------------------------------------------------------------------------------------------------
+
+class ProcessPool:
+    """Sends batches of requests from a pool of worker processes.
+
+    Converting responses (JSON of the shared library, cookies, ``Response.json()``) runs under the GIL, so a single
+    process is limited to about one core of that work. The pool starts ``processes`` workers (with the ``spawn``
+    start method), each with its own ``Session`` created from ``session_kwargs``, so every worker uses the same
+    fingerprint. The requests are sent to the workers in chunks of ``chunk_size``, a worker sends up to
+    ``threads_per_process`` of them at the same time.
+
+    Results are the picklable ``Response`` objects, or what ``parse`` returns for them. ``parse`` runs in the worker
+    (it has to be a module level function), so parsing the body is spread over the processes as well. With
+    ``sync_cookies`` the cookies of the parent jar (``pool.cookies``) are sent along with every chunk and the cookies
+    of the worker session are merged back into it when the chunk is done.
+
+    Usage::
+
+        def parse(response):
+            return response.json()["items"]
+
+        with tls_client.ProcessPool(processes=32, parse=parse, client_identifier="chrome_120") as pool:
+            for items in pool.map(("GET", f"https://www.example.com/api?page={page}") for page in range(10000)):
+                ...
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        threads_per_process: int = 8,
+        chunk_size: int = 16,
+        parse: Optional[Callable[[Response], Any]] = None,
+        sync_cookies: bool = False,
+        **session_kwargs: Any
+    ) -> None:
+        self.processes = processes or os.cpu_count() or 1
+        self.threads_per_process = threads_per_process
+        self.chunk_size = chunk_size
+        self.parse = parse
+        self.sync_cookies = sync_cookies
+        # Arguments of the `Session` of every worker, they have to be picklable
+        self.session_kwargs = session_kwargs
+
+        # Cookies shared with the workers when `sync_cookies` is set
+        self.cookies: RequestsCookieJar = cookiejar_from_dict({})
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                # the shared library does not survive fork
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.session_kwargs, self.parse, self.threads_per_process, list(self.cookies)),
+            )
+        return self._executor
+
+    def as_completed(
+        self,
+        requests: Iterable[Union[tuple, dict]],
+        timeout: Optional[float] = None
+    ) -> Iterator[Tuple[int, Any]]:
+        """Sends a batch of requests and yields ``(index, result)`` as the chunks complete.
+
+        ``requests`` takes the same specs as ``Session.as_completed`` and is consumed lazily, at most two chunks per
+        process are queued. The result is the ``Response`` (or the return value of ``parse``) or the exception raised
+        by that request. ``timeout`` is a deadline in seconds for the whole batch, requests which did not complete
+        in time get a ``TLSClientExeption``.
+        """
+        return self._as_completed(requests, timeout)
+
+    def _as_completed(
+        self,
+        requests: Iterable[Union[tuple, dict]],
+        timeout: Optional[float],
+        in_order: Optional[_InOrder] = None
+    ) -> Iterator[Tuple[int, Any]]:
+        executor = self._get_executor()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        specs = enumerate(requests)
+        pending = {}
+        try:
+            while True:
+                # --- Refill ---------------------------------------------------------------------------------------
+                # `map` stops sending chunks while too many results wait for a slow one
+                while len(pending) < 2 * self.processes and (in_order is None or not in_order.full):
+                    chunk = list(itertools.islice(specs, self.chunk_size))
+                    if not chunk:
+                        break
+                    cookies = list(self.cookies) if self.sync_cookies else None
+                    pending[executor.submit(_run_chunk, chunk, cookies)] = chunk
+                if not pending:
+                    return
+
+                # --- Wait -----------------------------------------------------------------------------------------
+                done, _ = wait(pending, timeout=_remaining(deadline), return_when=FIRST_COMPLETED)
+                if not done:
+                    for future in pending:
+                        future.cancel()
+                    yield from _deadline_exceeded((index for chunk in pending.values() for index, _ in chunk), specs)
+                    pending.clear()
+                    return
+                for future in done:
+                    chunk = pending.pop(future)
+                    try:
+                        results, cookies = future.result()
+                    except Exception as e:
+                        # the worker died or a result could not be pickled
+                        for index, _ in chunk:
+                            yield index, e
+                        continue
+                    if cookies is not None:
+                        for cookie in cookies:
+                            self.cookies.set_cookie(cookie)
+                    yield from results
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def map(
+        self,
+        requests: Iterable[Union[tuple, dict]],
+        timeout: Optional[float] = None
+    ) -> Iterator[Any]:
+        """Like ``as_completed``, but yields the results in the order of ``requests``.
+
+        No more chunks are sent while the results of ``2 * processes`` chunks wait for the next result in order.
+        """
+        in_order = _InOrder(limit=2 * self.processes * self.chunk_size)
+        for index, result in self._as_completed(requests, timeout, in_order):
+            yield from in_order.add(index, result)
+
+    def close(self) -> None:
+        """Shuts the worker processes down, their sessions are destroyed when they exit"""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            # chunks still queued are cancelled when their batch is closed
+            executor.shutdown(wait=True)
@@ -0,0 +1,173 @@
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import urllib.parse
+import threading
+import fnmatch
+import time
+
+
+_local = threading.local()
+
+
+@contextmanager
+def _already_waited() -> Iterator[None]:
+    """Marks the requests of the current thread as already rate limited (by ``AsyncSession`` before dispatching)"""
+    _local.waited = True
+    try:
+        yield
+    finally:
+        _local.waited = False
+
+
+def _has_waited() -> bool:
+    return getattr(_local, "waited", False)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Returns the seconds to wait of a Retry-After header (delay in seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    # imported on first use, like asyncio in `wait_async`, this module is imported by every session
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class _Bucket:
+    __slots__ = ("rate", "burst", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: Optional[float], burst: Optional[float], now: float) -> None:
+        # tokens per second, None for no limit (the bucket only tracks Retry-After)
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def reserve(self, now: float) -> float:
+        """Takes a token and returns how long to wait for it, tokens below zero are reservations of waiting callers"""
+        delay = 0.0
+        if self.rate is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens < 0:
+                delay = -self.tokens / self.rate
+        if self.blocked_until > now:
+            delay = max(delay, self.blocked_until - now)
+        return delay
+
+    def idle(self, now: float) -> bool:
+        if self.blocked_until > now:
+            return False
+        return self.rate is None or self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class RateLimiter:
+    """Token bucket rate limiter for requests, consulted by sessions before calling the shared library.
+
+    ``rate`` (requests per second) and ``burst`` apply to every host separately. ``rules`` sets limits for host
+    patterns (``fnmatch`` syntax, e.g. ``"*.example.com"``), the hosts matching a pattern share one bucket. The first
+    matching rule wins, hosts without a rule use ``rate``, None means no limit.
+
+    Callers which have to wait sleep (or await) exactly until their token is available, in the order they arrived.
+    After a 429 or 503 response with a ``Retry-After`` header, requests to the host are held back until then (at
+    most ``max_retry_after`` seconds).
+
+    One limiter can be shared by any number of sessions, e.g. all identities of a ``SessionPool`` respecting one
+    budget per target.
+
+    Usage::
+
+        limiter = tls_client.RateLimiter(rate=5, burst=10, rules={"api.example.com": (1, 1)})
+        session = tls_client.Session(client_identifier="chrome_120", rate_limiter=limiter)
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        rules: Optional[Dict[str, Union[float, Tuple[float, float]]]] = None,
+        respect_retry_after: bool = True,
+        max_retry_after: float = 300.0,
+        max_buckets: int = 10000,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate or 1, 1)
+        self.rules: List[Tuple[str, float, float]] = []
+        for pattern, limit in (rules or {}).items():
+            rule_rate, rule_burst = limit if isinstance(limit, tuple) else (limit, max(limit, 1))
+            self.rules.append((pattern.lower(), rule_rate, rule_burst))
+        self.respect_retry_after = respect_retry_after
+        self.max_retry_after = max_retry_after
+        # idle per host buckets are dropped when there are more
+        self.max_buckets = max_buckets
+
+        self._buckets: Dict[str, _Bucket] = {}
+        # bucket key of each host
+        self._keys: Dict[str, Tuple[str, Optional[float], Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host: str, now: float) -> _Bucket:
+        """Returns the bucket of a host, called with the lock held"""
+        key = self._keys.get(host)
+        if key is None:
+            key = (host, self.rate, self.burst if self.rate is not None else None)
+            for pattern, rate, burst in self.rules:
+                if fnmatch.fnmatchcase(host, pattern):
+                    key = (f"pattern:{pattern}", rate, burst)
+                    break
+            if len(self._keys) >= self.max_buckets:
+                self._keys.clear()
+            self._keys[host] = key
+        bucket = self._buckets.get(key[0])
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                for name in [name for name, bucket in self._buckets.items() if bucket.idle(now)]:
+                    del self._buckets[name]
+            bucket = self._buckets[key[0]] = _Bucket(key[1], key[2], now)
+        return bucket
+
+    def reserve(self, url: str) -> float:
+        """Reserves a request to the host of the url and returns the seconds to wait before sending it"""
+        host = (urllib.parse.urlsplit(url).hostname or "").lower()
+        with self._lock:
+            now = time.monotonic()
+            return self._bucket(host, now).reserve(now)
+
+    def wait(self, url: str) -> float:
+        """Blocks until a request to the host of the url may be sent, returns the seconds waited"""
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def wait_async(self, url: str) -> float:
+        """Awaitable version of ``wait``"""
+        import asyncio
+        delay = self.reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def update(self, url: str, status_code: int, headers: Dict[str, List[str]]) -> None:
+        """Holds back requests to the host after a 429 / 503 response with a Retry-After header"""
+        if not self.respect_retry_after or status_code not in (429, 503):
+            return
+        retry_after = None
+        for name, values in (headers or {}).items():
+            if name.lower() == "retry-after":
+                retry_after = parse_retry_after(values[0] if isinstance(values, list) else values)
+                break
+        if retry_after is None:
+            return
+        host = (urllib.parse.urlsplit(url).hostname or "").lower()
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._bucket(host, now)
+            bucket.blocked_until = max(bucket.blocked_until, now + min(retry_after, self.max_retry_after))
@@ -1,78 +1,375 @@
 from .cookies import cookiejar_from_dict, RequestsCookieJar
-from .structures import CaseInsensitiveDict
+from .json_codecs import JSONCodec, get_response_codec
+from .structures import CaseInsensitiveMultiDict
 
-from typing import Union
+from typing import Dict, Iterator, Optional, Union
+import datetime
+import base64
+import codecs
+import weakref
 import json
+import os
+
+
+def _get_encoding_from_headers(headers: CaseInsensitiveMultiDict) -> Optional[str]:
+    """Returns the charset of the Content-Type header, if there is one"""
+    content_type = headers.get_list("content-type")
+    if not content_type:
+        return None
+    for param in content_type[0].split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "charset":
+            return value.strip("'\" ") or None
+    return None
+
+
+def _decode_body(body: str) -> bytes:
+    """Decodes a body returned with ``isByteResponse`` (``data:<mimetype>;base64,<data>``) to bytes"""
+    if body.startswith("data:"):
+        separator = body.find(";base64,")
+        if separator != -1:
+            return base64.b64decode(body[separator + 8:])
+    return body.encode()
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+_MISSING = object()
 
 
 class Response:
-    """object, which contains the response to an HTTP request."""
+    """object, which contains the response to an HTTP request.
+
+    A response built by the session only keeps a reference to the decoded response of the shared library. Headers,
+    body, json and cookies are converted on first access and cached, so a caller who only reads ``status_code`` does
+    not pay for the rest.
+    """
 
-    def __init__(self):
+    __slots__ = (
+        "url",
+        "status_code",
+        "_raw",
+        "_is_byte_response",
+        "_headers",
+        "_encoding",
+        "_text",
+        "_content",
+        "_json",
+        "_cookies",
+        "_stream_path",
+        "_stream_finalizer",
+        "_codec",
+        "timings",
+        "from_cache",
+        "__weakref__",
+    )
 
+    def __init__(
+        self,
+        raw: Optional[dict] = None,
+        cookies: Optional[RequestsCookieJar] = None,
+        is_byte_response: bool = False,
+        stream_path: Optional[str] = None,
+        delete_stream: bool = False,
+        codec: Optional[JSONCodec] = None,
+        timings: Optional[Dict[str, float]] = None
+    ):
         # Reference of URL the response is coming from (especially useful with redirects)
-        self.url = None
+        self.url = raw["target"] if raw is not None else None
 
         # Integer Code of responded HTTP Status, e.g. 404 or 200.
-        self.status_code = None
+        self.status_code = raw["status"] if raw is not None else None
+
+        # Decoded response of the shared library, everything else is materialized from it on first access
+        self._raw = raw
+        self._is_byte_response = is_byte_response
+
+        self._headers = None
+        self._encoding = _MISSING
+        self._text = None
+        self._content = None
+        self._json = _MISSING
+        self._cookies = cookies
 
-        # String of responded HTTP Body.
-        self.text = None
+        # File the shared library streamed the body to, a temporary file is deleted when the response is closed or
+        # garbage collected
+        self._stream_path = stream_path
+        self._stream_finalizer = weakref.finalize(self, _remove_file, stream_path) if delete_stream else None
 
-        # Case-insensitive Dictionary of Response Headers.
-        self.headers = CaseInsensitiveDict()
+        # JSON codec chosen for the session, used by `json()`
+        self._codec = codec
 
-        # A CookieJar of Cookies the server sent back.
-        self.cookies = cookiejar_from_dict({})
-        
-        self._content = False
+        # Durations of the phases of the request in seconds, measured with a monotonic clock:
+        # prepare (url, body, headers, cookies), serialize (payload), native (shared library call), decode (response
+        # of the shared library), cookies (cookie extraction), build (Response object) and total
+        self.timings = timings if timings is not None else {}
+
+        # Whether the response was served from the HTTP cache of the session (including revalidated responses)
+        self.from_cache = False
+
+    def __getstate__(self):
+        """Compact picklable state, e.g. to send responses between processes.
+
+        The body is converted (a streamed body is read into memory) and only one of text and content is kept, the
+        JSON codec is not pickled.
+        """
+        if self._content is None and self._text is None:
+            self._load_body()
+        state = {
+            "url": self.url,
+            "status_code": self.status_code,
+            "headers": dict(self.headers._store),
+            "is_byte_response": self._is_byte_response,
+            "cookies": self._cookies,
+            "timings": self.timings,
+            "from_cache": self.from_cache,
+        }
+        if self._content is not None:
+            state["content"] = self._content
+        else:
+            state["text"] = self._text
+        if self._encoding is not _MISSING:
+            state["encoding"] = self._encoding
+        return state
+
+    def __setstate__(self, state):
+        Response.__init__(self, cookies=state["cookies"], is_byte_response=state["is_byte_response"])
+        self.url = state["url"]
+        self.status_code = state["status_code"]
+        self._headers = CaseInsensitiveMultiDict(state["headers"])
+        self._content = state.get("content")
+        self._text = state.get("text")
+        if "encoding" in state:
+            self._encoding = state["encoding"]
+        self.timings = state["timings"]
+        self.from_cache = state["from_cache"]
 
     def __enter__(self):
         return self
 
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Deletes the temporary file of a streamed response"""
+        if self._stream_finalizer is not None:
+            self._stream_finalizer()
+
     def __repr__(self):
         return f"<Response [{self.status_code}]>"
 
+    @property
+    def elapsed(self) -> datetime.timedelta:
+        """The amount of time elapsed between starting the request and building the response."""
+        return datetime.timedelta(seconds=self.timings.get("total", 0))
+
+    @property
+    def headers(self) -> CaseInsensitiveMultiDict:
+        """Case-insensitive Dictionary of Response Headers."""
+        if self._headers is None:
+            self._headers = CaseInsensitiveMultiDict(self._raw["headers"] if self._raw is not None else None)
+        return self._headers
+
+    @headers.setter
+    def headers(self, value):
+        if not isinstance(value, CaseInsensitiveMultiDict):
+            value = CaseInsensitiveMultiDict(
+                {key: values if isinstance(values, list) else [values] for key, values in (value or {}).items()}
+            )
+        self._headers = value
+
+    @property
+    def cookies(self) -> RequestsCookieJar:
+        """A CookieJar of Cookies the server sent back."""
+        if self._cookies is None:
+            self._cookies = cookiejar_from_dict({})
+        return self._cookies
+
+    @cookies.setter
+    def cookies(self, value):
+        self._cookies = value
+
+    @property
+    def encoding(self) -> Optional[str]:
+        """Encoding used to decode the body into text, guessed from the Content-Type header."""
+        if self._encoding is _MISSING:
+            self._encoding = _get_encoding_from_headers(self.headers)
+        return self._encoding
+
+    @encoding.setter
+    def encoding(self, value):
+        self._encoding = value
+        if self._is_byte_response and self._content is not None:
+            # text has to be decoded again
+            self._text = None
+
     def json(self, **kwargs):
-        """parse response body to json (dict/list)"""
-        return json.loads(self.text, **kwargs)
-    
+        """parse response body to json (dict/list)
+
+        Without arguments the body is parsed by the JSON codec chosen for the session (or with
+        ``json_codecs.set_default_codec``), straight from bytes for byte and streamed responses. Otherwise, and with
+        keyword arguments, ``json.loads`` is used. Invalid JSON raises ``json.JSONDecodeError`` with every codec.
+        """
+        if kwargs:
+            return json.loads(self.text, **kwargs)
+        if self._json is _MISSING:
+            codec = get_response_codec(self._codec)
+            if self._content is None and self._text is None:
+                self._load_body()
+            if self._is_byte_response and self._content is not None:
+                # charsets other than utf-8 need the decoded text
+                encoding = self.encoding
+                if encoding is None or encoding.lower().replace("-", "") == "utf8":
+                    self._json = codec.loads(self._content)
+                    return self._json
+            self._json = codec.loads(self.text)
+        return self._json
+
+    def _release_raw(self):
+        # the raw response (and with it the raw body) is not needed anymore once the body has been converted
+        if self._raw is not None:
+            self.headers
+            self._raw = None
+
+    def _load_body(self):
+        if self._stream_path is not None:
+            with open(self._stream_path, "rb") as f:
+                self._content = f.read()
+            self._is_byte_response = True
+            self._release_raw()
+            return
+        body = self._raw["body"] if self._raw is not None else None
+        if body is None:
+            return
+        if self._is_byte_response:
+            self._content = _decode_body(body)
+        else:
+            self._text = body
+        self._release_raw()
+
+    @property
+    def text(self) -> Optional[str]:
+        """Content of the response, in unicode."""
+        if self._text is None:
+            if self._content is None:
+                self._load_body()
+            if self._text is None and self._content is not None:
+                self._text = self._content.decode(self.encoding or "utf-8", errors="replace")
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._release_raw()
+        self._is_byte_response = False
+        self._text = value
+        self._content = None
+        self._json = _MISSING
+
     @property
-    def content(self):
+    def content(self) -> Optional[bytes]:
         """Content of the response, in bytes."""
-        
-        if self._content is False:
-            if self._content_consumed:
-                raise RuntimeError("The content for this response was already consumed")
+        if self._content is None:
+            if self._text is None:
+                self._load_body()
+            if self._content is None and self._text is not None:
+                self._content = self._text.encode()
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._release_raw()
+        self._is_byte_response = True
+        self._content = value
+        self._text = None
+        self._json = _MISSING
+
+
+    def iter_content(self, chunk_size: int = 8192, decode_unicode: bool = False) -> Iterator[Union[bytes, str]]:
+        """Iterates over the response body in chunks of ``chunk_size`` bytes.
 
-            if self.status_code == 0:
-                self._content = None
+        A streamed body is read from its file, which is memory mapped if possible, so it is never loaded into memory
+        at once.
+        """
+        if decode_unicode:
+            decoder = codecs.getincrementaldecoder(self.encoding or "utf-8")(errors="replace")
+            for chunk in self.iter_content(chunk_size):
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+            return
+
+        if self._stream_path is not None and self._content is None:
+            import mmap
+            with open(self._stream_path, "rb") as f:
+                try:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError):
+                    # empty files and some file systems can not be mapped
+                    mapped = None
+                if mapped is None:
+                    for chunk in iter(lambda: f.read(chunk_size), b""):
+                        yield chunk
+                    return
+                with mapped:
+                    for position in range(0, len(mapped), chunk_size):
+                        yield mapped[position:position + chunk_size]
+            return
+
+        content = self.content
+        if content is None:
+            return
+        for position in range(0, len(content), chunk_size):
+            yield content[position:position + chunk_size]
+
+    def iter_lines(
+        self,
+        chunk_size: int = 8192,
+        decode_unicode: bool = False,
+        delimiter: Optional[Union[str, bytes]] = None
+    ) -> Iterator[Union[bytes, str]]:
+        """Iterates over the response body, one line at a time."""
+        pending = None
+        carriage_return = False
+        for chunk in self.iter_content(chunk_size=chunk_size, decode_unicode=decode_unicode):
+            if pending is not None:
+                chunk = pending + chunk
+            # the "\n" of a "\r\n" can be the first character of the next chunk, the "\r" waits for it
+            carriage_return = not delimiter and chunk[-1:] in ("\r", b"\r")
+            if carriage_return:
+                chunk = chunk[:-1]
+            if delimiter:
+                # the last item continues in the next chunk (it is empty if the chunk ends with the delimiter)
+                lines = chunk.split(delimiter)
+                pending = lines.pop()
             else:
-                self._content = b"".join(self.iter_content(10 * 1024)) or b""
-        self._content_consumed = True
-        return self._content
+                lines = chunk.splitlines()
+                if lines and lines[-1] and chunk and lines[-1][-1] == chunk[-1]:
+                    pending = lines.pop()
+                else:
+                    pending = None
+            if carriage_return:
+                pending = (chunk[:0] if pending is None else pending) + ("\r" if isinstance(chunk, str) else b"\r")
+            yield from lines
+        if pending is not None:
+            yield pending[:-1] if carriage_return else pending
 
 
-def build_response(res: Union[dict, list], res_cookies: RequestsCookieJar) -> Response:
+def build_response(
+    res: Union[dict, list],
+    res_cookies: RequestsCookieJar,
+    is_byte_response: bool = False,
+    stream_path: Optional[str] = None,
+    delete_stream: bool = False,
+    codec: Optional[JSONCodec] = None,
+    timings: Optional[Dict[str, float]] = None
+) -> Response:
     """Builds a Response object """
-    response = Response()
-    # Add target / url
-    response.url = res["target"]
-    # Add status code
-    response.status_code = res["status"]
-    # Add headers
-    response_headers = {}
-    if res["headers"] is not None:
-        for header_key, header_value in res["headers"].items():
-            if len(header_value) == 1:
-                response_headers[header_key] = header_value[0]
-            else:
-                response_headers[header_key] = header_value
-    response.headers = response_headers
-    # Add cookies
-    response.cookies = res_cookies
-    # Add response body
-    response.text = res["body"]
-    # Add response content (bytes)
-    response._content = res["body"].encode()
-    return response
+    return Response(res, res_cookies, is_byte_response, stream_path, delete_stream, codec, timings)
@@ -0,0 +1,235 @@
+from .exceptions import TLSClientExeption
+from .proxies import ProxyManager
+from .response import Response
+from .sessions import Session
+
+from contextlib import contextmanager
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+import urllib.parse
+import threading
+import time
+
+
+class _PoolEntry:
+    __slots__ = ("session", "proxy", "in_flight", "last_used", "hosts")
+
+    def __init__(self, session: Session, proxy: Optional[str]):
+        self.session = session
+        self.proxy = proxy
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        # hosts this session sent requests to, most recent last
+        self.hosts = OrderedDict()
+
+
+class SessionPool:
+    """Manages a fleet of sessions created from the same template.
+
+    Each session is one client in the shared library, with its own connections. The pool caps the number of live
+    sessions, hands them out to at most ``max_in_flight`` callers at the same time, prefers sessions which already
+    talked to the requested host (and use the requested proxy) so warm connections get reused, and closes sessions
+    which have been idle for longer than ``idle_timeout`` seconds or have to make room for a new one.
+
+    Usage::
+
+        pool = tls_client.SessionPool(max_sessions=100, client_identifier="chrome_120")
+
+        with pool.session(host="www.example.com") as session:
+            res = session.get("https://www.example.com/")
+
+        # or let the pool pick the session by the host of the url
+        res = pool.get("https://www.example.com/")
+    """
+
+    # number of hosts remembered per session for host affinity
+    max_hosts_per_session = 32
+
+    def __init__(
+        self,
+        max_sessions: int = 10,
+        max_in_flight: int = 1,
+        idle_timeout: Optional[float] = None,
+        proxy: Optional[str] = None,
+        **session_kwargs: Any
+    ) -> None:
+        # Maximum number of sessions which are alive at the same time
+        self.max_sessions = max_sessions
+
+        # Maximum number of callers which use the same session at the same time
+        self.max_in_flight = max_in_flight
+
+        # Sessions which have not been used for this many seconds are closed, None keeps them forever
+        self.idle_timeout = idle_timeout
+
+        # Default proxy of the sessions, e.g. "http://user:pass@ip:port"
+        self.proxy = proxy
+
+        # Arguments passed to `Session` for every new session, e.g. client_identifier or h2_settings
+        self.session_kwargs = session_kwargs
+
+        self._entries: Dict[int, _PoolEntry] = {}
+        self._host_affinity: Dict[str, Dict[int, _PoolEntry]] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _create_session(self, proxy: Optional[str]) -> Session:
+        session = Session(**self.session_kwargs)
+        if proxy:
+            session.proxies = {"http": proxy, "https": proxy}
+        return session
+
+    def _remove(self, entry: _PoolEntry) -> None:
+        del self._entries[id(entry.session)]
+        for host in entry.hosts:
+            sessions = self._host_affinity.get(host)
+            if sessions is not None:
+                sessions.pop(id(entry.session), None)
+                if not sessions:
+                    del self._host_affinity[host]
+
+    def _evict_idle(self, now: float) -> List[Session]:
+        if self.idle_timeout is None:
+            return []
+        evicted = [
+            entry for entry in self._entries.values()
+            if entry.in_flight == 0 and now - entry.last_used > self.idle_timeout
+        ]
+        for entry in evicted:
+            self._remove(entry)
+        return [entry.session for entry in evicted]
+
+    def _select(self, host: Optional[str], proxy: Optional[str]) -> Optional[_PoolEntry]:
+        # 1. a session which already has a connection to the host
+        if host is not None:
+            for entry in self._host_affinity.get(host, {}).values():
+                if entry.in_flight < self.max_in_flight and entry.proxy == proxy:
+                    return entry
+        # 2. the least busy session with the same proxy
+        candidates = [
+            entry for entry in self._entries.values()
+            if entry.in_flight < self.max_in_flight and entry.proxy == proxy
+        ]
+        if candidates:
+            return min(candidates, key=lambda entry: (entry.in_flight, -entry.last_used))
+        return None
+
+    def checkout(self, host: Optional[str] = None, proxy: Optional[str] = None, timeout: Optional[float] = None) -> Session:
+        """Takes a session out of the pool, it has to be returned with ``checkin``.
+
+        Blocks up to ``timeout`` seconds (forever if None) if all sessions are busy and the pool is full.
+
+        :param host: host the session is used for, sessions which talked to it before are preferred
+        :param proxy: proxy the session has to use, defaults to the proxy of the pool
+        """
+        proxy = proxy or self.proxy
+        deadline = None if timeout is None else time.monotonic() + timeout
+        closing = []
+        try:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise TLSClientExeption("session pool is closed")
+                    now = time.monotonic()
+                    closing.extend(self._evict_idle(now))
+
+                    entry = self._select(host, proxy)
+                    if entry is None and len(self._entries) >= self.max_sessions:
+                        # make room by closing the least recently used idle session
+                        idle = [entry for entry in self._entries.values() if entry.in_flight == 0]
+                        if idle:
+                            least_recently_used = min(idle, key=lambda entry: entry.last_used)
+                            self._remove(least_recently_used)
+                            closing.append(least_recently_used.session)
+                    if entry is None and len(self._entries) < self.max_sessions:
+                        entry = _PoolEntry(self._create_session(proxy), proxy)
+                        self._entries[id(entry.session)] = entry
+
+                    if entry is not None:
+                        entry.in_flight += 1
+                        entry.last_used = now
+                        if host is not None:
+                            entry.hosts.pop(host, None)
+                            entry.hosts[host] = None
+                            self._host_affinity.setdefault(host, {})[id(entry.session)] = entry
+                            if len(entry.hosts) > self.max_hosts_per_session:
+                                oldest_host, _ = entry.hosts.popitem(last=False)
+                                sessions = self._host_affinity.get(oldest_host)
+                                if sessions is not None:
+                                    sessions.pop(id(entry.session), None)
+                                    if not sessions:
+                                        del self._host_affinity[oldest_host]
+                        return entry.session
+
+                    remaining = None if deadline is None else deadline - now
+                    if remaining is not None and remaining <= 0:
+                        raise TLSClientExeption("no session available in the session pool")
+                    self._condition.wait(remaining)
+        finally:
+            # destroying sessions calls into the shared library, never do that while holding the lock
+            for session in closing:
+                session.close()
+
+    def checkin(self, session: Session) -> None:
+        """Returns a session taken with ``checkout`` to the pool"""
+        with self._condition:
+            entry = self._entries.get(id(session))
+            if entry is None:
+                # evicted or the pool has been closed in the meantime
+                return
+            entry.in_flight -= 1
+            entry.last_used = time.monotonic()
+            self._condition.notify()
+
+    @contextmanager
+    def session(self, host: Optional[str] = None, proxy: Optional[str] = None, timeout: Optional[float] = None) -> Iterator[Session]:
+        """Context manager version of ``checkout`` / ``checkin``"""
+        session = self.checkout(host=host, proxy=proxy, timeout=timeout)
+        try:
+            yield session
+        finally:
+            self.checkin(session)
+
+    def execute_request(self, method: str, url: str, **kwargs: Any) -> Response:
+        """Sends a request with a session picked by the host of the url and the proxy argument.
+
+        A ``ProxyManager`` passed as ``proxy`` picks the proxy of the request itself, the session is picked as if no
+        proxy was passed.
+        """
+        host = urllib.parse.urlsplit(url).hostname
+        proxy = kwargs.pop("proxy", None)
+        if isinstance(proxy, ProxyManager):
+            kwargs["proxy"] = proxy
+            proxy = None
+        elif isinstance(proxy, dict):
+            proxy = proxy.get("http")
+        with self.session(host=host, proxy=proxy) as session:
+            return session.execute_request(method=method, url=url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any) -> Response:
+        """Sends a GET request"""
+        return self.execute_request(method="GET", url=url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> Response:
+        """Sends a POST request"""
+        return self.execute_request(method="POST", url=url, **kwargs)
+
+    def close(self) -> None:
+        """Closes all sessions of the pool, sessions which are checked out are closed as well"""
+        with self._condition:
+            self._closed = True
+            sessions = [entry.session for entry in self._entries.values()]
+            self._entries.clear()
+            self._host_affinity.clear()
+            self._condition.notify_all()
+        for session in sessions:
+            session.close()
@@ -1,17 +1,134 @@
-from .cffi import request, freeMemory, destroySession
-from .cookies import cookiejar_from_dict, merge_cookies, extract_cookies_to_jar
+from .cffi import request, call
+from .cleanup import track, untrack, destroy_session
+from .cookies import cookiejar_from_dict, extract_cookies_to_jar, get_cookies_for_url, CookieOverlay
 from .exceptions import TLSClientExeption
-from .response import build_response, Response
+from .hooks import default_hooks, dispatch_hook
+from .json_codecs import JSONCodec, get_codec
+from .proxies import ProxyManager
+from .ratelimit import _has_waited
+from .response import build_response, Response, _remove_file
 from .settings import ClientIdentifiers
-from .structures import CaseInsensitiveDict
+from .singleflight import SingleFlight
+from .structures import CaseInsensitiveDict, merge_headers
 from .__version__ import __version__
 
-from typing import Any, Dict, List, Optional, Union
-from json import dumps, loads
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from http.cookiejar import CookieJar, Cookie
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union, TYPE_CHECKING
+from json import dumps
 import urllib.parse
+import tempfile
+import itertools
 import base64
-import ctypes
+import math
+import time
 import uuid
+import os
+
+if TYPE_CHECKING:
+    # only imported when they are used, see __init__.py
+    from .cache import HTTPCache
+    from .metrics import MetricsCollector
+    from .ratelimit import RateLimiter
+
+
+def _serialize_cookie(cookie: Cookie) -> dict:
+    # in the cookie value the " gets removed, because the fhttp library in golang doesn't accept the character
+    return {
+        'domain': cookie.domain,
+        'expires': cookie.expires,
+        'name': cookie.name,
+        'path': cookie.path,
+        'value': cookie.value.replace('"', "")
+    }
+
+
+# Session attributes which only affect the static part of the request payload, see `Session._get_static_payload`
+_STATIC_PAYLOAD_ATTRIBUTES = frozenset((
+    "_session_id",
+    "client_identifier",
+    "ja3_string",
+    "h2_settings",
+    "h2_settings_order",
+    "supported_signature_algorithms",
+    "supported_delegated_credentials_algorithms",
+    "supported_versions",
+    "key_share_curves",
+    "cert_compression_algo",
+    "additional_decode",
+    "pseudo_header_order",
+    "connection_flow",
+    "priority_frames",
+    "header_order",
+    "header_priority",
+    "random_tls_extension_order",
+    "force_http1",
+    "catch_panics",
+    "debug",
+    "certificate_pinning",
+))
+
+
+# Methods of requests which can share a call to the shared library, see `Session.coalesce_requests`
+_COALESCABLE_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+
+def _unpack_request_spec(spec: Union[tuple, list, dict]) -> Tuple[str, str, dict]:
+    """Turns a batch request spec into (method, url, kwargs).
+
+    A spec is either a ``(method, url)`` / ``(method, url, kwargs)`` tuple or a dict with ``method`` and ``url`` keys,
+    all other keys are passed to ``execute_request``.
+    """
+    if isinstance(spec, dict):
+        kwargs = dict(spec)
+        return kwargs.pop("method"), kwargs.pop("url"), kwargs
+    if len(spec) == 2:
+        return spec[0], spec[1], {}
+    method, url, kwargs = spec
+    return method, url, kwargs or {}
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    """Returns the seconds left until the deadline of a batch, None if it has no deadline"""
+    return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+
+def _deadline_exceeded(indexes: Iterable[int], specs: Iterator[Tuple[int, Any]]) -> Iterator[Tuple[int, Exception]]:
+    """Fails the requests of a batch which did not complete before its deadline, the ones in flight (``indexes``) and
+    the ones which were not sent yet (the rest of ``specs``)"""
+    for index in itertools.chain(indexes, (index for index, _ in specs)):
+        yield index, TLSClientExeption("batch deadline exceeded")
+
+
+class _InOrder:
+    """Puts the ``(index, result)`` pairs of a batch back into the order of the requests, used by the ``map`` methods"""
+
+    def __init__(self, limit: int) -> None:
+        self._buffered = {}
+        self._next_index = 0
+        # number of buffered results at which the batch stops sending requests
+        self.limit = limit
+
+    @property
+    def full(self) -> bool:
+        # the next result in order is always in flight when the buffer is full, so the batch can not stall
+        return len(self._buffered) >= self.limit
+
+    def add(self, index: int, result: Any) -> List[Any]:
+        """Buffers a result and returns the results which are next in order"""
+        self._buffered[index] = result
+        ready = []
+        while self._next_index in self._buffered:
+            ready.append(self._buffered.pop(self._next_index))
+            self._next_index += 1
+        return ready
+
+
+def _rate_limited_call(rate_limiter: Optional["RateLimiter"], url: str, payload: bytes) -> Tuple[float, bytes]:
+    """Waits for a token of the rate limiter (if any) and sends the request, returns the seconds waited and the
+    response of the shared library"""
+    waited = rate_limiter.wait(url) if rate_limiter is not None else 0.0
+    return waited, call(request, payload)
 
 
 class Session:
@@ -38,8 +155,17 @@ class Session:
         catch_panics: Optional = False,
         debug: Optional = False,
         certificate_pinning: Optional[Dict[str, List[str]]] = None,
+        json_codec: Optional[Union[str, JSONCodec]] = None,
+        metrics: Optional["MetricsCollector"] = None,
+        cache: Optional["HTTPCache"] = None,
+        coalesce_requests: bool = False,
+        rate_limiter: Optional["RateLimiter"] = None,
     ) -> None:
         self._session_id = str(uuid.uuid4())
+        # whether the shared library (probably) holds a client for this session and when it was used the last time,
+        # used by the idle session reaper
+        self._native_active = False
+        self._last_used = time.monotonic()
         # --- Standard Settings ----------------------------------------------------------------------------------------
 
         # Case-insensitive dictionary of headers, send on each request
@@ -57,6 +183,7 @@ class Session:
         #     "http": "http://user:pass@ip:port",
         #     "https": "http://user:pass@ip:port"
         # }
+        # or a `ProxyManager`, which picks a healthy proxy for each request, see proxies.py
         self.proxies = {}
 
         # Dictionary of querystring data to attach to each request. The dictionary values may be lists for representing
@@ -65,13 +192,46 @@ class Session:
 
         # CookieJar containing all currently outstanding cookies set on this session
         self.cookies = cookiejar_from_dict({})
+        # serialized cookies per (scheme, host, path) of the request url, see `_get_request_cookies`
+        self._request_cookies_cache = {}
 
         # Timeout
         self.timeout_seconds = 30
 
+        # Event-handling hooks, see hooks.py
+        # Example:
+        # {
+        #     "pre_request": [],
+        #     "post_response": [lambda response, **kwargs: print(response.timings)],
+        #     "on_error": []
+        # }
+        self.hooks = default_hooks()
+
+        # HTTP cache for GET requests, see cache.py
+        # Example:
+        # tls_client.HTTPCache(max_bytes=64 * 1024 * 1024)
+        self.cache = cache
+
+        # Paces the requests per host, can be shared by many sessions, see ratelimit.py
+        # Example:
+        # tls_client.RateLimiter(rate=5, burst=10)
+        self.rate_limiter = rate_limiter
+
+        # Collects request counters and latency histograms, see metrics.py
+        if metrics is not None:
+            metrics.attach(self)
+
         # Certificate pinning
         self.certificate_pinning = certificate_pinning
 
+        # JSON codec used for the payloads sent to the tls client, its responses and `Response.json()`. Request bodies
+        # passed as `json=` are always encoded with the json module.
+        # Examples: "json", "orjson", "msgspec" or a `JSONCodec` instance
+        # None uses the default codec, which is orjson or msgspec if installed, otherwise the json module. With None
+        # `Response.json()` uses the json module (orjson parses integers beyond 64 bits as floats), unless a default
+        # was chosen with `json_codecs.set_default_codec`.
+        self.json_codec = get_codec(json_codec) if json_codec is not None else None
+
         # --- Advanced Settings ----------------------------------------------------------------------------------------
 
         # Examples:
@@ -278,28 +438,144 @@ class Session:
         # debugging
         self.debug = debug
 
+        # receive response bodies as bytes
+        # the body is transferred base64 encoded and decoded to `Response.content`, `Response.text` is decoded from it
+        # using the charset of the response. Use this for binary content like images or protobuf.
+        self.byte_response = False
+
+        # share one call to the shared library between concurrent identical GET, HEAD and OPTIONS requests of this
+        # session (same url, headers, cookies, proxy, ...), every caller still gets its own Response
+        self.coalesce_requests = coalesce_requests
+        self._single_flight = SingleFlight()
+
+        # the state of the session in the shared library is destroyed when the session is garbage collected without
+        # being closed, see cleanup.py. Registered last, the idle session reaper reads the attributes set above.
+        self._finalizer = track(self)
+
+    def __setattr__(self, name, value):
+        # reassigning a fingerprint / transport setting invalidates the cached static payload
+        if name in _STATIC_PAYLOAD_ATTRIBUTES:
+            object.__setattr__(self, "_static_payload", None)
+        object.__setattr__(self, name, value)
+
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
         self.close()
 
-    def close(self) -> str:
-        destroy_session_payload = {
-            "sessionId": self._session_id
-        }
-
-        destroy_session_response = destroySession(dumps(destroy_session_payload).encode('utf-8'))
-        # we dereference the pointer to a byte array
-        destroy_session_response_bytes = ctypes.string_at(destroy_session_response)
-        # convert our byte array to a string (tls client returns json)
-        destroy_session_response_string = destroy_session_response_bytes.decode('utf-8')
-        # convert response string to json
-        destroy_session_response_object = loads(destroy_session_response_string)
+    def _get_static_payload(self, codec: JSONCodec) -> bytes:
+        """Returns the serialized members of the request payload, which are the same for every request.
+
+        The fragment is compiled once and cached until one of the corresponding attributes is reassigned. Changes made
+        in place (e.g. ``session.h2_settings["HEADER_TABLE_SIZE"] = 65536``) are not detected, reassign the attribute
+        instead.
+        """
+        static_payload = self._static_payload
+        if static_payload is None:
+            payload = {
+                "sessionId": self._session_id,
+                "forceHttp1": self.force_http1,
+                "withDebug": self.debug,
+                "catchPanics": self.catch_panics,
+                "headerOrder": self.header_order,
+                "additionalDecode": self.additional_decode,
+            }
+            if self.certificate_pinning:
+                payload["certificatePinningHosts"] = self.certificate_pinning
+            if self.client_identifier is None:
+                payload["customTlsClient"] = {
+                    "ja3String": self.ja3_string,
+                    "h2Settings": self.h2_settings,
+                    "h2SettingsOrder": self.h2_settings_order,
+                    "pseudoHeaderOrder": self.pseudo_header_order,
+                    "connectionFlow": self.connection_flow,
+                    "priorityFrames": self.priority_frames,
+                    "headerPriority": self.header_priority,
+                    "certCompressionAlgo": self.cert_compression_algo,
+                    "supportedVersions": self.supported_versions,
+                    "supportedSignatureAlgorithms": self.supported_signature_algorithms,
+                    "supportedDelegatedCredentialsAlgorithms": self.supported_delegated_credentials_algorithms,
+                    "keyShareCurves": self.key_share_curves,
+                }
+            else:
+                payload["tlsClientIdentifier"] = self.client_identifier
+                payload["withRandomTLSExtensionOrder"] = self.random_tls_extension_order
+            # strip the braces, the members are spliced into the payload of each request
+            static_payload = codec.dumps(payload)[1:-1]
+            self._static_payload = static_payload
+        return static_payload
+
+    def _get_request_cookies(self, cookie_jar: Union[CookieJar, CookieOverlay], url: str, codec: JSONCodec) -> bytes:
+        """Returns the serialized cookies of the jar which have to be sent to the url.
+
+        The cookies of the session jar are cached per (scheme, host, path) until the jar changes or one of the
+        cookies expires, the cookies of the request (if any) are layered over them.
+        """
+        overlay = None
+        if isinstance(cookie_jar, CookieOverlay):
+            overlay, cookie_jar = cookie_jar, cookie_jar.jar
+
+        url = urllib.parse.urlsplit(url)
+        key = (url.scheme, url.hostname or "", url.path or "/")
+        version = getattr(cookie_jar, "_version", None)
+        now = time.time()
+
+        cached = self._request_cookies_cache.get(key)
+        if cached is not None and cached[0] is cookie_jar and cached[1] == version and now < cached[2]:
+            request_cookies, serialized_request_cookies = cached[3], cached[4]
+        else:
+            cookies = get_cookies_for_url(cookie_jar, *key, now=now)
+            request_cookies = [_serialize_cookie(c) for c in cookies]
+            serialized_request_cookies = codec.dumps(request_cookies)
+            if version is not None:
+                if len(self._request_cookies_cache) >= 1024:
+                    self._request_cookies_cache.clear()
+                expires_at = min((c.expires for c in cookies if c.expires is not None), default=math.inf)
+                self._request_cookies_cache[key] = (
+                    cookie_jar, version, expires_at, request_cookies, serialized_request_cookies
+                )
+
+        if overlay is None:
+            return serialized_request_cookies
+        return codec.dumps(
+            [_serialize_cookie(c) for c in overlay.get_request_cookies_for_url(*key, now=now)]
+            + [c for c in request_cookies if c["name"] not in overlay.names]
+        )
 
-        freeMemory(destroy_session_response_object['id'].encode('utf-8'))
+    def register_hook(self, event: str, hook: Callable) -> None:
+        """Properly register a hook."""
+        if event not in self.hooks:
+            raise ValueError(f'Unsupported event specified, with event name "{event}"')
+        self.hooks[event].append(hook)
+
+    def deregister_hook(self, event: str, hook: Callable) -> bool:
+        """Deregister a previously registered hook.
+        Returns True if the hook existed, False if not.
+        """
+        try:
+            self.hooks[event].remove(hook)
+            return True
+        except ValueError:
+            return False
+
+    def _coalesces(self, method: str, stream: Optional[bool], stream_to: Optional[str]) -> bool:
+        """Returns whether a request can share the call to the shared library with identical requests in flight"""
+        return self.coalesce_requests and method in _COALESCABLE_METHODS and not stream and stream_to is None
+
+    def _may_be_cached(self, method: str, stream: Optional[bool], stream_to: Optional[str]) -> bool:
+        """Returns whether a request can be served from the cache of the session"""
+        return self.cache is not None and method == "GET" and not stream and stream_to is None
+
+    def coalescing_stats(self) -> Dict[str, int]:
+        """Returns the number of native calls made and of requests which shared a call made by another request"""
+        return self._single_flight.stats()
 
-        return destroy_session_response_string
+    def close(self) -> str:
+        self._finalizer.detach()
+        untrack(self)
+        self._native_active = False
+        return destroy_session(self._session_id, get_codec(self.json_codec))
 
     def execute_request(
         self,
@@ -313,8 +589,28 @@ class Session:
         allow_redirects: Optional[bool] = False,
         insecure_skip_verify: Optional[bool] = False,
         timeout_seconds: Optional[int] = None,
-        proxy: Optional[dict] = None  # Optional[dict[str, str]]
+        proxy: Optional[Union[dict, str, ProxyManager]] = None,  # Optional[dict[str, str]]
+        byte_response: Optional[bool] = None,
+        stream: Optional[bool] = False,
+        stream_to: Optional[str] = None
     ) -> Response:
+        # start of the request, the durations of the phases are recorded in `Response.timings`
+        started = time.perf_counter()
+        if isinstance(proxy or self.proxies, ProxyManager):
+            # the proxy manager picks the proxy and calls this method again with it
+            return (proxy or self.proxies).execute_request(
+                self, method, url, params=params, data=data, headers=headers, cookies=cookies, json=json,
+                allow_redirects=allow_redirects, insecure_skip_verify=insecure_skip_verify,
+                timeout_seconds=timeout_seconds, byte_response=byte_response, stream=stream, stream_to=stream_to
+            )
+        codec = get_codec(self.json_codec)
+        hooks = self.hooks
+        self._last_used = time.monotonic()
+        if not self._finalizer.alive:
+            # the session is used again after it has been closed
+            self._finalizer = track(self, reopened=True)
+        self._native_active = True
+
         # --- URL ------------------------------------------------------------------------------------------------------
         # Prepare URL - add params to url
         if params is not None:
@@ -325,6 +621,7 @@ class Session:
         # Data has priority. JSON is only used if data is None.
         if data is None and json is not None:
             if type(json) in [dict, list]:
+                # the json module, so the body does not depend on the installed codec
                 json = dumps(json)
             request_body = json
             content_type = "application/json"
@@ -334,36 +631,21 @@ class Session:
         else:
             request_body = data
             content_type = None
-        # set content type if it isn't set
-        if content_type is not None and "content-type" not in self.headers:
-            self.headers["Content-Type"] = content_type
 
         # --- Headers --------------------------------------------------------------------------------------------------
-        if self.headers is None:
-            headers = CaseInsensitiveDict(headers)
-        elif headers is None:
-            headers = self.headers
-        else:
-            merged_headers = CaseInsensitiveDict(self.headers)
-            merged_headers.update(headers)
-
-            # Remove items, where the key or value is set to None.
-            none_keys = [k for (k, v) in merged_headers.items() if v is None or k is None]
-            for key in none_keys:
-                del merged_headers[key]
-
-            headers = merged_headers
+        # request headers are layered over the session headers, items where the value is set to None are removed.
+        # The content type is only set if neither of them contains it.
+        headers = merge_headers(
+            self.headers,
+            headers,
+            {"Content-Type": content_type} if content_type is not None else None
+        )
 
         # --- Cookies --------------------------------------------------------------------------------------------------
-        cookies = cookies or {}
-        # Merge with session cookies
-        cookies = merge_cookies(self.cookies, cookies)
-        # turn cookie jar into dict
-        # in the cookie value the " gets removed, because the fhttp library in golang doesn't accept the character
-        request_cookies = [
-            {'domain': c.domain, 'expires': c.expires, 'name': c.name, 'path': c.path, 'value': c.value.replace('"', "")}
-            for c in cookies
-        ]
+        # the request cookies are layered over the session cookies for this request only
+        cookies = CookieOverlay(self.cookies, cookies) if cookies else self.cookies
+        # only the cookies matching the url are sent
+        request_cookies = self._get_request_cookies(cookies, url, codec)
 
         # --- Proxy ----------------------------------------------------------------------------------------------------
         proxy = proxy or self.proxies
@@ -380,75 +662,225 @@ class Session:
 
         timeout_seconds = timeout_seconds or self.timeout_seconds
 
-        # --- Certificate pinning --------------------------------------------------------------------------------------
-        # pins a certificate so that it restricts which certificates are considered valid
+        # --- Response body --------------------------------------------------------------------------------------------
+        is_byte_response = self.byte_response if byte_response is None else byte_response
+
+        # --- Stream ---------------------------------------------------------------------------------------------------
+        # the shared library writes the body to a file instead of returning it, read it with `Response.iter_content`
+        delete_stream = stream_to is None and bool(stream)
+        if delete_stream:
+            stream_file, stream_to = tempfile.mkstemp(prefix="tls-client-", suffix=".body")
+            os.close(stream_file)
 
-        certificate_pinning = self.certificate_pinning
-        
         # --- Request --------------------------------------------------------------------------------------------------
+        # only the fields which can change per request are serialized here, the session settings (fingerprint,
+        # certificate pinning, ...) are spliced in from the cached static payload
         is_byte_request = isinstance(request_body, (bytes, bytearray))
         request_payload = {
-            "sessionId": self._session_id,
             "followRedirects": allow_redirects,
-            "forceHttp1": self.force_http1,
-            "withDebug": self.debug,
-            "catchPanics": self.catch_panics,
-            "headers": dict(headers),
-            "headerOrder": self.header_order,
+            "headers": headers,
             "insecureSkipVerify": insecure_skip_verify,
             "isByteRequest": is_byte_request,
-            "additionalDecode": self.additional_decode,
+            "isByteResponse": is_byte_response,
             "proxyUrl": proxy,
             "requestUrl": url,
             "requestMethod": method,
             "requestBody": base64.b64encode(request_body).decode() if is_byte_request else request_body,
-            "requestCookies": request_cookies,
             "timeoutSeconds": timeout_seconds,
         }
-        if certificate_pinning:
-            request_payload["certificatePinningHosts"] = certificate_pinning
-        if self.client_identifier is None:
-            request_payload["customTlsClient"] = {
-                "ja3String": self.ja3_string,
-                "h2Settings": self.h2_settings,
-                "h2SettingsOrder": self.h2_settings_order,
-                "pseudoHeaderOrder": self.pseudo_header_order,
-                "connectionFlow": self.connection_flow,
-                "priorityFrames": self.priority_frames,
-                "headerPriority": self.header_priority,
-                "certCompressionAlgo": self.cert_compression_algo,
-                "supportedVersions": self.supported_versions,
-                "supportedSignatureAlgorithms": self.supported_signature_algorithms,
-                "supportedDelegatedCredentialsAlgorithms": self.supported_delegated_credentials_algorithms ,
-                "keyShareCurves": self.key_share_curves,
-            }
-        else:
-            request_payload["tlsClientIdentifier"] = self.client_identifier
-            request_payload["withRandomTLSExtensionOrder"] = self.random_tls_extension_order
-
-        # this is a pointer to the response
-        response = request(dumps(request_payload).encode('utf-8'))
-        # dereference the pointer to a byte array
-        response_bytes = ctypes.string_at(response)
-        # convert our byte array to a string (tls client returns json)
-        response_string = response_bytes.decode('utf-8')
-        # convert response string to json
-        response_object = loads(response_string)
-        # free the memory
-        freeMemory(response_object['id'].encode('utf-8'))
-        # --- Response -------------------------------------------------------------------------------------------------
-        # Error handling
-        if response_object["status"] == 0:
-            raise TLSClientExeption(response_object["body"])
-        # Set response cookies
-        response_cookie_jar = extract_cookies_to_jar(
-            request_url=url,
-            request_headers=headers,
-            cookie_jar=cookies,
-            response_headers=response_object["headers"]
-        )
-        # build response class
-        return build_response(response_object, response_cookie_jar)
+        if stream_to is not None:
+            request_payload["streamOutputPath"] = stream_to
+
+        # --- Cache ----------------------------------------------------------------------------------------------------
+        # fresh responses are served without calling the shared library, stale ones are revalidated with a conditional
+        # request
+        cache = self.cache if stream_to is None else None
+        if cache is not None:
+            request_time = time.time()
+            cache_entry, fresh = cache.lookup(method, url, headers, request_cookies, is_byte_response)
+            if fresh:
+                finished = time.perf_counter()
+                timings = {"prepare": finished - started, "total": finished - started}
+                response = build_response(
+                    cache.serve(cache_entry), None, is_byte_response, codec=self.json_codec, timings=timings
+                )
+                response.from_cache = True
+                if hooks["post_response"]:
+                    response = dispatch_hook("post_response", hooks, response, session=self, request=request_payload)
+                return response
+            if cache_entry is not None:
+                request_payload["headers"] = cache.conditional_headers(cache_entry, headers)
+
+        # --- Rate limit -----------------------------------------------------------------------------------------------
+        # waits for a token of the host, responses served from the cache do not need one. Coalesced requests wait
+        # when they call the shared library, so requests which share the call of another one do not take a token.
+        rate_limiter = self.rate_limiter
+        token_limiter = rate_limiter if rate_limiter is not None and not _has_waited() else None
+        coalesce = self._coalesces(method, stream, stream_to)
+        waited = 0.0
+        if token_limiter is not None and not coalesce:
+            waited = token_limiter.wait(url)
+
+        timings = {}
+        try:
+            if hooks["pre_request"]:
+                request_payload = dispatch_hook("pre_request", hooks, request_payload, session=self)
+            prepared = time.perf_counter()
+            payload = (
+                b"{" + self._get_static_payload(codec)
+                + b',"requestCookies":' + request_cookies
+                + b"," + codec.dumps(request_payload)[1:]
+            )
+            serialized = time.perf_counter()
+            timings["prepare"] = prepared - started - waited
+            timings["serialize"] = serialized - prepared
+            if waited:
+                timings["ratelimit"] = waited
+
+            # copies the response of the tls client and frees its memory
+            if coalesce:
+                # the payload describes the request completely, identical payloads are sent once
+                (waited, response_bytes), shared = self._single_flight.do(
+                    payload, _rate_limited_call, token_limiter, url, payload
+                )
+                if waited and not shared:
+                    timings["ratelimit"] = waited
+                    serialized += waited
+            else:
+                response_bytes = call(request, payload)
+            received = time.perf_counter()
+            timings["native"] = received - serialized
+            # convert response bytes to json (tls client returns json)
+            response_object = codec.loads(response_bytes)
+            decoded = time.perf_counter()
+            timings["decode"] = decoded - received
+            self._last_used = time.monotonic()
+            # --- Response ---------------------------------------------------------------------------------------------
+            # Error handling
+            if response_object["status"] == 0:
+                raise TLSClientExeption(response_object["body"])
+            if rate_limiter is not None and response_object["status"] in (429, 503):
+                # honors Retry-After
+                rate_limiter.update(url, response_object["status"], response_object["headers"])
+            # Set response cookies
+            response_cookie_jar = extract_cookies_to_jar(
+                request_url=url,
+                request_headers=headers,
+                cookie_jar=cookies,
+                response_headers=response_object["headers"]
+            )
+            extracted = time.perf_counter()
+            timings["cookies"] = extracted - decoded
+            # a 304 to a conditional request of the cache is answered with the stored response
+            from_cache = False
+            if cache is not None:
+                if cache_entry is not None and response_object["status"] == 304:
+                    response_object = cache.revalidated(cache_entry, response_object, request_time)
+                    from_cache = True
+                else:
+                    cache.store(method, url, headers, request_cookies, is_byte_response, response_object, request_time)
+                cached = time.perf_counter()
+                timings["cache"] = cached - extracted
+                extracted = cached
+            # build response class
+            response = build_response(
+                response_object, response_cookie_jar, is_byte_response, stream_to, delete_stream, self.json_codec,
+                timings
+            )
+            response.from_cache = from_cache
+            finished = time.perf_counter()
+            timings["build"] = finished - extracted
+            timings["total"] = finished - started
+        except Exception as e:
+            if delete_stream:
+                # nobody owns the temporary file of the body yet
+                _remove_file(stream_to)
+            if hooks["on_error"]:
+                timings["total"] = time.perf_counter() - started
+                dispatch_hook("on_error", hooks, e, session=self, request=request_payload, timings=timings)
+            raise
+
+        if hooks["post_response"]:
+            response = dispatch_hook("post_response", hooks, response, session=self, request=request_payload)
+        return response
+
+    def as_completed(
+        self,
+        requests: Iterable[Union[tuple, dict]],
+        max_workers: int = 10,
+        timeout: Optional[float] = None
+    ) -> Iterator[Tuple[int, Union[Response, Exception]]]:
+        """Sends a batch of requests concurrently and yields ``(index, result)`` as soon as each one completes.
+
+        ``requests`` is an iterable of ``(method, url)``, ``(method, url, kwargs)`` or ``{"method": ..., "url": ...,
+        **kwargs}`` specs. It is consumed lazily: at most ``max_workers`` requests are in flight at the same time, so
+        producers get backpressure. The result is the ``Response`` or the exception raised by that request, a failing
+        request never aborts the batch. ``timeout`` is a deadline in seconds for the whole batch, requests which did
+        not complete in time get a ``TLSClientExeption``.
+        """
+        return self._as_completed(requests, max_workers, timeout)
+
+    def _as_completed(
+        self,
+        requests: Iterable[Union[tuple, dict]],
+        max_workers: int,
+        timeout: Optional[float],
+        in_order: Optional[_InOrder] = None
+    ) -> Iterator[Tuple[int, Union[Response, Exception]]]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        specs = enumerate(requests)
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tls-client")
+        pending = {}
+        try:
+            while True:
+                # --- Refill ---------------------------------------------------------------------------------------
+                # `map` stops sending requests while too many results wait for a slow one
+                while len(pending) < max_workers and (in_order is None or not in_order.full):
+                    try:
+                        index, spec = next(specs)
+                    except StopIteration:
+                        break
+                    try:
+                        method, url, kwargs = _unpack_request_spec(spec)
+                    except Exception as e:
+                        yield index, e
+                        continue
+                    future = executor.submit(Session.execute_request, self, method, url, **kwargs)
+                    pending[future] = index
+                if not pending:
+                    return
+
+                # --- Wait -----------------------------------------------------------------------------------------
+                done, _ = wait(pending, timeout=_remaining(deadline), return_when=FIRST_COMPLETED)
+                if not done:
+                    for future in pending:
+                        future.cancel()
+                    yield from _deadline_exceeded(pending.values(), specs)
+                    pending.clear()
+                    return
+                for future in done:
+                    index = pending.pop(future)
+                    exception = future.exception()
+                    yield index, exception if exception is not None else future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def map(
+        self,
+        requests: Iterable[Union[tuple, dict]],
+        max_workers: int = 10,
+        timeout: Optional[float] = None
+    ) -> Iterator[Union[Response, Exception]]:
+        """Like ``as_completed``, but yields the results in the order of ``requests``.
+
+        Results which complete before the ones ahead of them are buffered. Once ``2 * max_workers`` results are
+        buffered, no more requests are sent until the next result in order completes.
+        """
+        in_order = _InOrder(limit=2 * max_workers)
+        for index, result in self._as_completed(requests, max_workers, timeout, in_order):
+            yield from in_order.add(index, result)
 
     def get(
         self,
@@ -0,0 +1,65 @@
+from typing import Any, Callable, Dict, Hashable, Tuple
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "exception")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls with the same key.
+
+    The first caller of a key runs the function, callers which arrive while it is running wait for it and get the
+    same result (or exception) instead of running the function again.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            # calls which ran the function
+            "calls": 0,
+            # calls which waited for the result of another call
+            "coalesced": 0,
+        }
+
+    def do(self, key: Hashable, function: Callable, *args: Any) -> Tuple[Any, bool]:
+        """Returns the result of ``function(*args)`` and whether it was shared with a call already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._stats["calls"] += 1
+                leader = True
+            else:
+                self._stats["coalesced"] += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result, True
+
+        try:
+            call.result = function(*args)
+        except BaseException as e:
+            call.exception = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of calls which ran the function, which were coalesced and which are in flight"""
+        with self._lock:
+            counts = dict(self._stats)
+            counts["in_flight"] = len(self._calls)
+        return counts
@@ -1,5 +1,4 @@
-from typing import MutableMapping, Mapping
-from collections import OrderedDict
+from typing import MutableMapping, Mapping, Optional
 
 
 class CaseInsensitiveDict(MutableMapping):
@@ -29,13 +28,20 @@ class CaseInsensitiveDict(MutableMapping):
     If the constructor, ``.update``, or equality comparison
     operations are given keys that have equal ``.lower()``s, the
     behavior is undefined.
+
+    The entries are stored in a plain (insertion ordered) dict as
+    ``lowercased key -> (key, value)``, so the lowercased keys are
+    computed once when a key is set.
     """
 
+    __slots__ = ("_store",)
+
     def __init__(self, data=None, **kwargs):
-        self._store = OrderedDict()
-        if data is None:
-            data = {}
-        self.update(data, **kwargs)
+        self._store = {}
+        if data:
+            self.update(data)
+        if kwargs:
+            self.update(kwargs)
 
     def __setitem__(self, key, value):
         # Use the lowercased key for lookups, but store the actual
@@ -66,9 +72,137 @@ class CaseInsensitiveDict(MutableMapping):
         # Compare insensitively
         return dict(self.lower_items()) == dict(other.lower_items())
 
+    def __contains__(self, key):
+        return isinstance(key, str) and key.lower() in self._store
+
+    def get(self, key, default=None):
+        entry = self._store.get(key.lower())
+        return default if entry is None else entry[1]
+
     # Copy is required
     def copy(self):
-        return CaseInsensitiveDict(self._store.values())
+        copied = CaseInsensitiveDict()
+        copied._store = self._store.copy()
+        return copied
 
     def __repr__(self):
         return str(dict(self.items()))
+
+
+class CaseInsensitiveMultiDict(MutableMapping):
+    """A case-insensitive view on multi-value headers, as the shared library returns them (``{name: [values]}``).
+
+    The given dict is not copied, the lowercased index is only built on the first lookup and the dict is only copied
+    on the first modification. For compatibility with plain dict headers, a header with a single value is returned as
+    string and a header with multiple values as list. Use ``get_list`` to always get a list::
+
+        headers = CaseInsensitiveMultiDict({"Set-Cookie": ["a=1", "b=2"], "Server": ["nginx"]})
+        headers["server"] == "nginx"  # True
+        headers.get_list("set-cookie") == ["a=1", "b=2"]  # True
+    """
+
+    __slots__ = ("_store", "_lower_keys", "_owned")
+
+    def __init__(self, data=None):
+        self._store = data if data is not None else {}
+        self._lower_keys = None
+        self._owned = data is None
+
+    def _index(self):
+        if self._lower_keys is None:
+            self._lower_keys = {key.lower(): key for key in self._store}
+        return self._lower_keys
+
+    def _own(self):
+        if not self._owned:
+            self._store = dict(self._store)
+            self._owned = True
+
+    def get_list(self, key, default=None):
+        """Returns all values of a header as list"""
+        cased_key = self._index().get(key.lower())
+        if cased_key is None:
+            return [] if default is None else default
+        return self._store[cased_key]
+
+    def __getitem__(self, key):
+        values = self._store[self._index()[key.lower()]]
+        return values[0] if len(values) == 1 else values
+
+    def __setitem__(self, key, value):
+        self._own()
+        index = self._index()
+        cased_key = index.get(key.lower())
+        if cased_key is not None:
+            del self._store[cased_key]
+        self._store[key] = value if isinstance(value, list) else [value]
+        index[key.lower()] = key
+
+    def __delitem__(self, key):
+        self._own()
+        del self._store[self._index().pop(key.lower())]
+
+    def __contains__(self, key):
+        return isinstance(key, str) and key.lower() in self._index()
+
+    def __iter__(self):
+        return iter(self._store)
+
+    def __len__(self):
+        return len(self._store)
+
+    def lower_items(self):
+        """Like iteritems(), but with all lowercase keys."""
+        return ((key.lower(), self[key]) for key in self._store)
+
+    def __eq__(self, other):
+        if isinstance(other, Mapping):
+            other = CaseInsensitiveDict(other)
+        else:
+            return NotImplemented
+        return dict(self.lower_items()) == dict(other.lower_items())
+
+    def copy(self):
+        return CaseInsensitiveMultiDict({key: list(values) for key, values in self._store.items()})
+
+    def __repr__(self):
+        return str(dict(self.items()))
+
+
+def _lower_store(headers: Optional[Mapping]) -> dict:
+    if not headers:
+        return {}
+    if isinstance(headers, CaseInsensitiveDict):
+        return headers._store
+    return {key.lower(): (key, value) for key, value in headers.items() if key is not None}
+
+
+def merge_headers(
+    session_headers: Optional[Mapping],
+    request_headers: Optional[Mapping] = None,
+    default_headers: Optional[Mapping] = None
+) -> dict:
+    """Resolves the headers of a request into the plain dict sent to the tls client.
+
+    ``request_headers`` are layered over ``session_headers`` (case-insensitive, a request header keeps the position of
+    the session header it replaces), ``default_headers`` are only used if neither of them contains the header. Headers
+    with a None value are removed. None of the given mappings is copied or modified.
+    """
+    session_store = _lower_store(session_headers)
+    request_store = _lower_store(request_headers)
+
+    headers = {}
+    for lower_key, (key, value) in session_store.items():
+        if lower_key in request_store:
+            key, value = request_store[lower_key]
+        if value is not None:
+            headers[key] = value
+    for lower_key, (key, value) in request_store.items():
+        if lower_key not in session_store and value is not None:
+            headers[key] = value
+    if default_headers:
+        for key, value in default_headers.items():
+            lower_key = key.lower()
+            if lower_key not in session_store and lower_key not in request_store:
+                headers[key] = value
+    return headers